@@ -6,18 +6,32 @@ import os
 import re
 import threading
 import json
-import urllib.request
-import urllib.error
 import shlex
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import functools
+import hashlib
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Literal, TypedDict, Any, cast, Optional
+from typing import Callable, Literal, TypedDict, Any, cast, Optional
 
 
-def run_uncaptured_command(command: str):
-    """Run a shell command and return the output."""
-    subprocess.run(command, shell=True, capture_output=False, text=True)
+def run_uncaptured_command(command: list[str]):
+    """Run a command without capturing output."""
+    subprocess.run(command, capture_output=False, text=True)
+
+
+GRAPHITE_VERSION_WARNING_START = "ℹ️ The Graphite CLI version you have installed"
+GRAPHITE_VERSION_WARNING_END = "- Team Graphite :)"
+
+# A whole warning block: from the line containing the start marker through the next
+# line containing the end marker (or to the end of the output if it never closes)
+_GRAPHITE_WARNING_BLOCK_RE = re.compile(
+    rf"^[^\n]*{re.escape(GRAPHITE_VERSION_WARNING_START)}[^\n]*"
+    rf"(?:\n.*?^[^\n]*{re.escape(GRAPHITE_VERSION_WARNING_END)}[^\n]*$|.*)\n?",
+    re.MULTILINE | re.DOTALL,
+)
 
 
 def filter_graphite_warnings(output: str) -> str:
@@ -25,87 +39,216 @@ def filter_graphite_warnings(output: str) -> str:
     Filter out Graphite CLI version warnings from command output.
     These warnings can interfere with parsing the actual command results.
     """
-    lines = output.splitlines()
-    filtered_lines: list[str] = []
-    skip_mode = False
-
-    for line in lines:
-        # Check if this line starts a warning block
-        if "ℹ️ The Graphite CLI version you have installed" in line:
-            skip_mode = True
-            continue
-
-        # Check if this line ends a warning block
-        if skip_mode and "- Team Graphite :)" in line:
-            skip_mode = False
-            continue
+    # Nearly all output has no warning block, so skip the substitution copy entirely
+    if GRAPHITE_VERSION_WARNING_START not in output:
+        return output.strip()
 
-        # Skip lines that are part of the warning block
-        if skip_mode:
-            continue
+    return _GRAPHITE_WARNING_BLOCK_RE.sub("", output).strip()
 
-        # Keep lines that contain brew/npm update instructions but aren't part of warning block
-        if not skip_mode:
-            filtered_lines.append(line)
 
-    return "\n".join(filtered_lines).strip()
+def format_command(command: list[str]) -> str:
+    """Render an argv list for display."""
+    return shlex.join(command)
 
 
-def run_command(command: str, show_output_in_terminal: bool = False) -> str:
+def run_command(
+    command: list[str],
+    show_output_in_terminal: bool = False,
+    stdin: Optional[str] = None,
+) -> str:
     """
-    Run a shell command and return the output.
-    If show_output_in_terminal is True, print the output to the terminal.
+    Run a command and return the output.
+    The argv list is executed directly, without a shell in between.
+    If stdin is given it is written to the command's standard input (non-streaming only).
+    If show_output_in_terminal is True, print the output (stderr included) to the terminal as it arrives.
     In the case of any failure, print all stderr and exit with a non-zero code.
     Automatically filters out Graphite CLI version warnings from output.
     """
-    process = subprocess.Popen(
-        command,
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1,
-        universal_newlines=True,
-    )
-
-    output_lines: list[str] = []
-    # Read stdout and stderr in real-time
-    while True:
-        stdout_line = process.stdout.readline() if process.stdout else None
-        if stdout_line:
-            if show_output_in_terminal:
-                print(stdout_line, end="")
-            output_lines.append(stdout_line)
-
-        if process.poll() is not None:
-            break
+    if not show_output_in_terminal:
+        # Nothing to stream, so let communicate() collect everything in one go
+        completed = subprocess.run(
+            command, input=stdin, capture_output=True, text=True
+        )
+        returncode = completed.returncode
+        output = completed.stdout
+        error_output = completed.stderr
+    else:
+        # Fold stderr into the same pipe so the person watching sees it live (and
+        # Graphite warnings written there get filtered), with one reader draining both.
+        # Leaving the with block closes the pipe and reaps the process.
+        with subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        ) as process:
+            # Stream raw stdout chunks straight through to the terminal until EOF and
+            # decode once at the end
+            buffer = bytearray()
+            if process.stdout:
+                sys.stdout.flush()  # keep anything already printed ahead of the stream
+                # Only push each chunk out immediately for a person watching; when piped
+                # (e.g. into a log) let the block-buffered stdout batch the writes
+                interactive = sys.stdout.isatty()
+                fd = process.stdout.fileno()
+                while chunk := os.read(fd, 65536):
+                    sys.stdout.buffer.write(chunk)
+                    if interactive:
+                        sys.stdout.buffer.flush()
+                    buffer.extend(chunk)
+
+            returncode = process.wait()
+        output = buffer.decode(errors="replace")
+        error_output = ""
 
-    returncode = process.wait()
-    output = "".join(output_lines).strip()
     if returncode != 0:
-        error_output = (
-            process.stderr.read() if process.stderr else ""
-        ) or "No error output"
         print(
-            f"Error running command: {command}\n{output}\n{error_output}",
+            f"Error running command: {format_command(command)}\n{output.strip()}\n{error_output or ('See output above' if show_output_in_terminal else 'No error output')}",
             file=sys.stderr,
         )
         exit(1)
 
-    # Filter out Graphite CLI version warnings
+    # Filter out Graphite CLI version warnings (this also strips the output, so the
+    # possibly large captured text is only copied once)
     return filter_graphite_warnings(output)
 
 
+# Serializes output from commands run on worker threads so lines don't interleave
+_print_lock = threading.Lock()
+
+
 def run_update_command(
-    command: str, dry_run: bool, show_output_in_terminal: bool = False
+    command: list[str],
+    dry_run: bool,
+    show_output_in_terminal: bool = False,
+    stdin: Optional[str] = None,
 ) -> str:
     if dry_run:
-        print(f"Dry run: {command}")
+        with _print_lock:
+            print(f"Dry run: {format_command(command)}")
+            if stdin is not None:
+                print(f"<<EOF\n{stdin}\nEOF")
         return ""
-    return run_command(command, show_output_in_terminal=show_output_in_terminal)
+    output = run_command(
+        command, show_output_in_terminal=show_output_in_terminal, stdin=stdin
+    )
+    # Anything gh changes on GitHub may be reflected in cached gh reads
+    if command[0] == "gh":
+        clear_gh_cache()
+    return output
+
+
+# Short-lived disk cache of read-only gh queries so back-to-back sync/submit runs
+# skip the GitHub round-trips. Disabled with --no-cache.
+_gh_cache_enabled = True
+
+GH_CACHE_TTL_CLOSED_PRS = 60  # seconds
+GH_CACHE_TTL_PR_LIST = 30
+# No entry older than the longest TTL can be served again
+GH_CACHE_MAX_AGE = max(GH_CACHE_TTL_CLOSED_PRS, GH_CACHE_TTL_PR_LIST)
 
 
-COLORS = {
+def disable_gh_cache() -> None:
+    """Bypass the gh read cache for the rest of this invocation."""
+    global _gh_cache_enabled
+    _gh_cache_enabled = False
+
+
+def get_gh_cache_dir() -> str:
+    """Get the directory holding cached gh query results."""
+    cache_dir = os.path.join(os.path.expanduser("~"), ".gt-wrapper", "gh_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def _gh_cache_scope() -> str:
+    """Short id of the repository the working directory is in; prefixes its cache entries."""
+    repo = os.getcwd()
+    git_dir = find_git_dir()
+    if git_dir:
+        repo = git_dir
+        # Linked worktrees point at the main repository, whose PRs they share
+        try:
+            with open(os.path.join(git_dir, "commondir"), "r") as f:
+                repo = os.path.join(git_dir, f.read().strip())
+        except OSError:
+            pass
+    return hashlib.sha256(os.path.realpath(repo).encode()).hexdigest()[:16]
+
+
+def clear_gh_cache() -> None:
+    """Drop the cached gh query results for the current repository."""
+    try:
+        cache_dir = get_gh_cache_dir()
+        prefix = f"{_gh_cache_scope()}-"
+        for name in os.listdir(cache_dir):
+            if not name.startswith(prefix):
+                continue
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+    except OSError:
+        pass
+
+
+def _prune_gh_cache(cache_dir: str) -> None:
+    """Remove entries (and stray temp files) too old to ever be served again."""
+    cutoff = time.time() - GH_CACHE_MAX_AGE
+    try:
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+
+def run_cached_command(command: list[str], ttl_seconds: float) -> str:
+    """
+    Run a read-only command, reusing its output from an identical run in the same
+    directory within the last ttl_seconds.
+    """
+    if not _gh_cache_enabled:
+        return run_command(command)
+
+    # gh resolves the repo from the working directory, so it's part of the key
+    cache_key = hashlib.sha256(json.dumps([os.getcwd(), command]).encode()).hexdigest()
+    try:
+        cache_dir = get_gh_cache_dir()
+        cache_file = os.path.join(cache_dir, f"{_gh_cache_scope()}-{cache_key}.json")
+    except OSError:
+        return run_command(command)
+
+    try:
+        with open(cache_file, "rb") as f:
+            cached = cast(dict[str, Any], json.loads(f.read()))
+        if time.time() - cached["ts"] < ttl_seconds:
+            return cached["output"]
+        # Expired, so drop it rather than leave it behind if this query isn't repeated
+        os.remove(cache_file)
+    except Exception:
+        pass
+
+    output = run_command(command)
+    try:
+        # Write to a private temp file and rename it into place, so a concurrent
+        # run (or a worker thread) never reads a half-written entry
+        tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(json.dumps({"ts": time.time(), "output": output}).encode())
+        os.replace(tmp_file, cache_file)
+    except Exception:
+        pass
+    # Queries whose keys never come up again (e.g. other branch lists) would
+    # otherwise pile up; a miss already waited on GitHub, so sweep them here
+    _prune_gh_cache(cache_dir)
+    return output
+
+
+ANSI_COLORS = {
     "GREEN": "\033[92m",
     "YELLOW": "\033[93m",
     "RED": "\033[91m",
@@ -114,15 +257,27 @@ COLORS = {
     "BOLD": "\033[1m",
 }
 
+# Leave out escape codes when output is piped (CI logs, scripts) or NO_COLOR is set
+# (https://no-color.org), so the text stays plain for whatever reads it
+_USE_COLOR = sys.stdout.isatty() and not os.environ.get("NO_COLOR")
+COLORS = {name: code if _USE_COLOR else "" for name, code in ANSI_COLORS.items()}
+
 
-def get_og_gt_path():
-    """Get the path to the bundled Graphite CLI."""
+@functools.lru_cache(maxsize=1)
+def _script_dir() -> str:
+    """Directory of this script, following symlinks to get the actual script location."""
+    return os.path.dirname(os.path.realpath(__file__))
+
+
+@functools.lru_cache(maxsize=1)
+def get_og_gt_path() -> str:
+    """
+    Get the path to the bundled Graphite CLI.
+    Resolved lazily on first use so paths that never call gt (e.g. --version) skip the check.
+    """
     # The original Graphite CLI is always installed relative to this script
-    # Use realpath to follow symlinks to get the actual script location
-    script_path = os.path.realpath(__file__)
-    script_dir = os.path.dirname(script_path)
     gt_path = os.path.join(
-        script_dir, "../node_modules/@withgraphite/graphite-cli/graphite.js"
+        _script_dir(), "../node_modules/@withgraphite/graphite-cli/graphite.js"
     )
 
     if not os.path.isfile(gt_path):
@@ -135,9 +290,6 @@ def get_og_gt_path():
     return gt_path
 
 
-OG_GT_PATH = get_og_gt_path()
-
-
 # Cached trunk branch to avoid repeated gt trunk calls
 _trunk_branch: Optional[str] = None
 
@@ -146,43 +298,147 @@ def get_trunk_branch() -> str:
     """Get the trunk branch, caching the result to avoid repeated calls."""
     global _trunk_branch
     if _trunk_branch is None:
-        _trunk_branch = run_command(f"{OG_GT_PATH} trunk")
+        _trunk_branch = run_command([get_og_gt_path(), "trunk"])
     return _trunk_branch
 
 
+# Branch name following the "↱ $ " marker in `gt ls --classic` output
+_CLASSIC_BRANCH_RE = re.compile(r"↱ \$ (\S+)")
+
+
 # Sync command functions
 def get_local_branches() -> set[str]:
     """Get all local branches from gt ls except trunk."""
-    output = run_command(f"{OG_GT_PATH} ls --classic")
-    branches: set[str] = set()
-    for line in output.splitlines():
-        if "↱ $ " in line:
-            branch = line.split("↱ $ ")[1].split()[0]
-            branches.add(branch)
+    output = run_command([get_og_gt_path(), "ls", "--classic"])
+    branches = {match.group(1) for match in _CLASSIC_BRANCH_RE.finditer(output)}
 
     branches.discard(get_trunk_branch())
     return branches
 
 
-def get_closed_pr_branches() -> set[str]:
-    """Get head branches of all closed PRs, sorted by most recently updated."""
-    # Use search query to sort by updated date (most recent first)
-    prs = run_command(
-        "gh pr list --search 'is:merged sort:updated-desc' --limit 125 --json headRefName "
-        "--jq 'map(select(.headRefName | test(\"^renovate/\") | not)) | .[].headRefName'"
+# Aliased pullRequests lookups per GraphQL query when checking specific branches
+MERGED_PR_QUERY_CHUNK_SIZE = 50
+# Newest merged PRs looked at per branch name; names like "wip" get reused, so an
+# older PR from the same name mustn't hide the one that matches the local branch
+MERGED_PRS_PER_BRANCH = 5
+
+
+def _get_merged_pr_heads_chunk(branches: list[str]) -> dict[str, list[str]]:
+    """
+    Return the head commits of merged PRs opened from this repository (not a fork)
+    for each of the given head branch names, in one GraphQL query.
+    """
+    aliases = " ".join(
+        f"b{i}: pullRequests(headRefName: {json.dumps(branch)}, states: MERGED, "
+        f"first: {MERGED_PRS_PER_BRANCH}, orderBy: {{field: CREATED_AT, direction: DESC}}) "
+        "{ nodes { headRefOid headRepositoryOwner { login } } }"
+        for i, branch in enumerate(branches)
+    )
+    query = (
+        "query($owner: String!, $name: String!) { repository(owner: $owner, name: $name) { "
+        f"owner {{ login }} {aliases} }} }}"
+    )
+    result = run_cached_command(
+        ["gh", "api", "graphql", "-F", "owner={owner}", "-F", "name={repo}", "-f", f"query={query}"],
+        GH_CACHE_TTL_CLOSED_PRS,
+    )
+    repository = json.loads(result)["data"]["repository"]
+    owner = repository["owner"]["login"]
+    return {
+        branch: [
+            pr["headRefOid"]
+            for pr in repository[f"b{i}"]["nodes"]
+            # A fork's head repository is gone (None) or owned by someone else
+            if (pr["headRepositoryOwner"] or {}).get("login") == owner
+        ]
+        for i, branch in enumerate(branches)
+    }
+
+
+def get_local_branch_tips() -> dict[str, str]:
+    """Map each local branch to the commit it points at, in one git call."""
+    output = run_command(
+        ["git", "for-each-ref", "--format=%(objectname) %(refname)", "refs/heads"]
+    )
+    tips: dict[str, str] = {}
+    for line in output.splitlines():
+        commit, _, ref = line.partition(" ")
+        tips[ref.removeprefix("refs/heads/")] = commit
+    return tips
+
+
+def is_ancestor(commit: str, descendant: str) -> bool:
+    """Whether commit is an ancestor of descendant; False when either isn't known locally."""
+    result = subprocess.run(
+        ["git", "merge-base", "--is-ancestor", commit, descendant], capture_output=True
     )
-    # Filter out empty strings
-    result = set((prs or "").split("\n"))
-    result.discard("")
-    return result
+    return result.returncode == 0
+
+
+def get_closed_pr_branches(branches: set[str]) -> set[str]:
+    """
+    Get which of the given local branches were merged through a PR.
+    A branch only counts when a merged PR from this repository contains everything on
+    it: the PR's head is the local tip, or the local tip is an ancestor of it. An old
+    PR whose branch name was later reused, or a fork's PR with the same name, doesn't
+    mark new local work as merged. Names are looked up in chunked GraphQL queries run
+    in parallel.
+    """
+    branch_list = sorted(branches)
+    if not branch_list:
+        return set()
+
+    chunks = [
+        branch_list[i : i + MERGED_PR_QUERY_CHUNK_SIZE]
+        for i in range(0, len(branch_list), MERGED_PR_QUERY_CHUNK_SIZE)
+    ]
+    merged_heads: dict[str, list[str]] = {}
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        for chunk_result in executor.map(_get_merged_pr_heads_chunk, chunks):
+            merged_heads.update(chunk_result)
+
+    local_tips = get_local_branch_tips()
+    merged: set[str] = set()
+    for branch, heads in merged_heads.items():
+        tip = local_tips.get(branch)
+        if tip and any(head == tip or is_ancestor(tip, head) for head in heads):
+            merged.add(branch)
+    return merged
 
 
 def delete_branch(branch: str, dry_run: bool):
     """Delete a local branch using gt delete to maintain stack relationships."""
-    run_update_command(f"{OG_GT_PATH} delete {branch} --force", dry_run)
+    run_update_command([get_og_gt_path(), "delete", branch, "--force"], dry_run)
     print(f"🗑️  Deleted branch: {COLORS['RED']}{branch}{COLORS['RESET']}")
 
 
+@functools.lru_cache(maxsize=1)
+def gt_delete_accepts_multiple_branches() -> bool:
+    """Check `gt delete --help` for a variadic branch argument (rendered like `[name..]`)."""
+    # Cached on disk like `gt --help`, so node only starts for it once per gt install
+    help_output = cached_for_gt_install(
+        get_gt_delete_help_cache_path(),
+        lambda: run_command([get_og_gt_path(), "delete", "--help"]),
+    )
+    return bool(re.search(r"delete \[\w+\.\.\]", help_output))
+
+
+def delete_branches(branches: list[str], dry_run: bool):
+    """
+    Delete local branches using gt delete, in a single invocation when the bundled
+    gt supports it. Otherwise falls back to one gt delete per branch, since deleting
+    with plain git would leave Graphite's stack metadata behind.
+    """
+    if len(branches) > 1 and gt_delete_accepts_multiple_branches():
+        run_update_command([get_og_gt_path(), "delete", *branches, "--force"], dry_run)
+        for branch in branches:
+            print(f"🗑️  Deleted branch: {COLORS['RED']}{branch}{COLORS['RESET']}")
+        return
+
+    for branch in branches:
+        delete_branch(branch, dry_run)
+
+
 def sync_command(
     dry_run: bool,
     skip_restack: bool = False,
@@ -191,7 +447,7 @@ def sync_command(
 ):
     """Execute the sync command functionality."""
     # if there are any local changes, exit
-    if run_command("git status --porcelain"):
+    if run_command(["git", "status", "--porcelain"]):
         print(
             f"{COLORS['RED']}⚠️  There are local changes. Please commit or stash them before running this script.{COLORS['RESET']}"
         )
@@ -202,8 +458,11 @@ def sync_command(
     
     # Store initial branch
     initial_branch = get_current_branch()
+    # Tracked branches don't change when trunk is pulled, so this one lookup is
+    # reused for the merged-branch check below
+    tracked_branches = get_local_branches()
     # check if the initial branch is tracked by Graphite (trunk is always allowed)
-    if initial_branch not in get_local_branches() and initial_branch != trunk_branch:
+    if initial_branch not in tracked_branches and initial_branch != trunk_branch:
         print(
             f"{COLORS['RED']}Error: Current branch '{initial_branch}' is not tracked by Graphite. Run 'gt track' and retry.{COLORS['RESET']}"
         )
@@ -226,12 +485,20 @@ def sync_command(
             print(f"{COLORS['RED']}⚠️  Error parsing stack: {e}{COLORS['RESET']}")
             exit(1)
 
+    # Start the GitHub lookup for just the branches we might clean up; it doesn't
+    # depend on the checkout/pull below
+    closed_pr_executor = ThreadPoolExecutor(max_workers=1)
+    closed_pr_future = closed_pr_executor.submit(
+        get_closed_pr_branches, stack_branches if current_stack else tracked_branches
+    )
+    closed_pr_executor.shutdown(wait=False)
+
     # Step 1: Checkout and pull trunk
     print(
         f"\n{COLORS['BLUE']}🔄 Switching to '{trunk_branch}' and pulling the latest changes...{COLORS['RESET']}"
     )
-    run_command(f"git checkout {trunk_branch}")
-    run_command("git pull")
+    run_command(["git", "checkout", trunk_branch])
+    run_command(["git", "pull"])
 
     # Step 2: Get local branches
     if current_stack:
@@ -239,13 +506,13 @@ def sync_command(
         local_branches = stack_branches
     else:
         print(f"\n{COLORS['BLUE']}📋 Fetching local branches...{COLORS['RESET']}")
-        local_branches = get_local_branches()
+        local_branches = tracked_branches
 
-    # Step 3: Get closed PR branches
+    # Step 3: Get closed PR branches (fetched in the background since before the pull)
     print(
         f"\n{COLORS['BLUE']}🔍 Fetching closed PR branches from GitHub...{COLORS['RESET']}"
     )
-    closed_pr_branches = get_closed_pr_branches()
+    closed_pr_branches = closed_pr_future.result()
 
     # Step 4: Find merged branches
     merged_branches = local_branches.intersection(closed_pr_branches)
@@ -266,9 +533,11 @@ def sync_command(
         print(
             f"\n{COLORS['YELLOW']}Found merged {scope_text} branches{auto_delete_note}:{COLORS['RESET']}"
         )
+        # Collect confirmations first so the deletions can be batched
+        branches_to_delete: list[str] = []
         for branch in merged_branches:
             if assume_yes:
-                delete_branch(branch, dry_run)
+                branches_to_delete.append(branch)
                 continue
 
             delete = (
@@ -279,7 +548,9 @@ def sync_command(
                 .lower()
             )
             if delete == "y" or delete == "":
-                delete_branch(branch, dry_run)
+                branches_to_delete.append(branch)
+
+        delete_branches(branches_to_delete, dry_run)
 
     # Step 6: Run gt restack (unless skipped or in current_stack mode)
     if not skip_restack:
@@ -293,9 +564,9 @@ def sync_command(
             
             if top_branch:
                 print(f"\n{COLORS['BLUE']}🔄 Running targeted restack from top of current stack: {top_branch}...{COLORS['RESET']}")
-                run_command(f"git checkout {top_branch}")
+                run_command(["git", "checkout", top_branch])
                 run_update_command(
-                    f"{OG_GT_PATH} restack",
+                    [get_og_gt_path(), "restack"],
                     dry_run,
                     show_output_in_terminal=True,
                 )
@@ -306,7 +577,7 @@ def sync_command(
         else:
             print(f"\n{COLORS['BLUE']}🔄 Running 'gt restack'...{COLORS['RESET']}")
             run_update_command(
-                f"{OG_GT_PATH} restack",
+                [get_og_gt_path(), "restack"],
                 dry_run,
                 show_output_in_terminal=True,
             )
@@ -317,42 +588,31 @@ def sync_command(
 
     # Step 7: Return to initial branch if it still exists
     if initial_branch not in merged_branches:
-        run_command(f"git checkout {initial_branch}")
+        run_command(["git", "checkout", initial_branch])
         print(
             f"\n{COLORS['BLUE']}↩️  Returned to branch: {initial_branch}{COLORS['RESET']}"
         )
 
 
+# Stack marker (◯ or ◉) followed by the branch name; anything after it on the
+# line (like "(needs restack)") is ignored
+_STACK_BRANCH_RE = re.compile(r"[◯◉][ \t]+(\S+)")
+# Tree characters that only appear when the stack forks
+_STACK_BRANCHING_MARKERS = ("│", "─┐")
+
+
 # Submit command functions
 def parse_stack_from_output(output: str) -> list[str]:
     """
     Pure parser: takes `gt ls --stack --reverse` output and returns an ordered list
     of branch names in bottom-to-top order (excluding trunk). Behavior unchanged.
     """
-    stack: list[str] = []
-    for line in output.splitlines():
-        if "◯" in line or "◉" in line:
-            # Extract branch name more robustly to handle "(needs restack)" messages
-            # Match pattern: optional whitespace, stack marker (◯ or ◉), optional whitespace, 
-            # capture branch name (word characters, dots, hyphens, underscores, forward slashes),
-            # ignore anything after whitespace (like "(needs restack)")
-            match = re.search(r'[◯◉]\s+([a-zA-Z0-9._\-/]+)', line)
-            if match:
-                branch = match.group(1)
-                stack.append(branch)
-            else:
-                # Fallback to original logic if regex doesn't match
-                words = line.strip().split()
-                # Filter out status messages like "(needs" and "restack)"
-                valid_words = [word for word in words if not (word.startswith('(') or word.endswith(')'))]
-                if valid_words:
-                    branch = valid_words[-1]
-                    stack.append(branch)
-
-        # Detect branching
-        if "│" in line or "─┐" in line:
-            print("Branching detected in the stack. Cannot run `gt submit`.")
-            sys.exit(1)
+    # Detect branching
+    if any(marker in output for marker in _STACK_BRANCHING_MARKERS):
+        print("Branching detected in the stack. Cannot run `gt submit`.")
+        sys.exit(1)
+
+    stack = [match.group(1) for match in _STACK_BRANCH_RE.finditer(output)]
 
     trunk_branch = get_trunk_branch()
     assert stack[0] == trunk_branch, f"Trunk branch '{trunk_branch}' not found in stack"
@@ -367,50 +627,196 @@ def parse_stack() -> list[str]:
     Parse the stack from `gt ls --stack --reverse` and return an ordered list of branch names.
     Returns in bottom to top order (ie, away from trunk). Removes trunk from the stack.
     """
-    output = run_command(f"{OG_GT_PATH} ls --stack --reverse")
+    output = run_command([get_og_gt_path(), "ls", "--stack", "--reverse"])
     return parse_stack_from_output(output)
 
 
+def find_git_dir() -> Optional[str]:
+    """
+    Locate the git directory for the working directory without starting git.
+    Returns None for setups this doesn't understand (e.g. GIT_DIR overrides).
+    """
+    if "GIT_DIR" in os.environ:
+        return None
+
+    directory = os.getcwd()
+    while True:
+        dot_git = os.path.join(directory, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git
+        if os.path.isfile(dot_git):
+            # Worktrees and submodules have a .git file pointing at the real git dir
+            try:
+                with open(dot_git, "r") as f:
+                    content = f.read().strip()
+            except OSError:
+                return None
+            if content.startswith("gitdir: "):
+                return os.path.join(directory, content[len("gitdir: "):])
+            return None
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
 def get_current_branch() -> str:
-    """Get the current git branch."""
-    return run_command("git branch --show-current")
+    """
+    Get the current git branch ("" when HEAD is detached).
+    Reads HEAD directly, falling back to git for anything unusual.
+    """
+    git_dir = find_git_dir()
+    if git_dir:
+        try:
+            with open(os.path.join(git_dir, "HEAD"), "r") as f:
+                head = f.read().strip()
+        except OSError:
+            head = ""
+        if head.startswith("ref: refs/heads/"):
+            branch = head[len("ref: refs/heads/"):]
+            # The reftable backend leaves a placeholder here instead of the real ref
+            if branch != ".invalid":
+                return branch
+        elif re.fullmatch(r"[0-9a-f]{40}|[0-9a-f]{64}", head):
+            return ""
 
+    return run_command(["git", "branch", "--show-current"])
 
-class BranchInfo(TypedDict):
+
+class PRComment(TypedDict):
+    id: str
+    body: str
+
+
+class _BranchInfoRequired(TypedDict):
     url: str
     base: str
     title: str
 
 
+class BranchInfo(_BranchInfoRequired, total=False):
+    # Issue comments on the PR, fetched alongside it so the stack comment can be found in-process
+    comments: list[PRComment]
+
+
 class PRInfo(TypedDict):
     owner: str
     repo: str
     branches: dict[str, BranchInfo]
 
 
+# Prefetched open PR data (url, base, title, comments) keyed by head branch name.
+# Populated once per submit by prefetch_pr_info so later lookups don't each fork `gh`.
+_PR_CACHE: dict[str, BranchInfo] = {}
+_PR_CACHE_REPO: Optional[tuple[str, str]] = None
+
+PR_PREFETCH_FIELDS = (
+    "nodes { headRefName url baseRefName title comments(first: 50) { nodes { id body } } }"
+)
+
+
+def _query_repository(selection: str, ttl_seconds: Optional[float] = None) -> dict[str, Any]:
+    """
+    Run one `gh api graphql` query against the current repository, returning its owner,
+    name and whatever `selection` asks for. gh fills in {owner}/{repo} from the checkout.
+    Pass ttl_seconds to serve the result from the gh read cache.
+    """
+    query = (
+        "query($owner: String!, $name: String!) { repository(owner: $owner, name: $name) { "
+        f"owner {{ login }} name {selection} }} }}"
+    )
+    command = [
+        "gh", "api", "graphql", "-F", "owner={owner}", "-F", "name={repo}", "-f", f"query={query}"
+    ]
+    if ttl_seconds is None:
+        result = run_command(command)
+    else:
+        result = run_cached_command(command, ttl_seconds)
+    return json.loads(result)["data"]["repository"]
+
+
+def _branch_info_from_node(pr: dict[str, Any]) -> BranchInfo:
+    """Convert a pullRequest node selected with PR_PREFETCH_FIELDS into BranchInfo."""
+    return {
+        "url": pr["url"],
+        "base": pr["baseRefName"],
+        "title": pr["title"],
+        "comments": pr["comments"]["nodes"],
+    }
+
+
+def _open_prs_for_branches(branches: list[str]) -> tuple[str, str, dict[str, BranchInfo]]:
+    """
+    Look up the open PR for each branch with aliased pullRequests fields in a single query.
+    Returns (owner, repo, prs by branch); branches without an open PR are left out.
+    """
+    aliases = " ".join(
+        f"b{i}: pullRequests(headRefName: {json.dumps(branch)}, states: OPEN, first: 1) {{ {PR_PREFETCH_FIELDS} }}"
+        for i, branch in enumerate(branches)
+    )
+    repository = _query_repository(aliases)
+
+    prs: dict[str, BranchInfo] = {}
+    for i, branch in enumerate(branches):
+        nodes = repository[f"b{i}"]["nodes"]
+        if nodes:
+            prs[branch] = _branch_info_from_node(nodes[0])
+    return repository["owner"]["login"], repository["name"], prs
+
+
+def prefetch_pr_info(branches: list[str]) -> None:
+    """
+    Fetch open PR data for every branch in a single `gh api graphql` round-trip
+    and store it in _PR_CACHE. Branches without an open PR are left out.
+    """
+    global _PR_CACHE_REPO
+    if not branches:
+        return
+
+    owner, repo, prs = _open_prs_for_branches(branches)
+    _PR_CACHE_REPO = (owner, repo)
+    _PR_CACHE.update(prs)
+
+
 def get_pr_info(single_branch: Optional[str] = None) -> PRInfo:
     """
     Get PR URLs and base branches for all branches that have open PRs.
-    Returns PR information including URLs and base branches
+    Returns PR information including URLs and base branches.
+    Served from _PR_CACHE when it has been prefetched; otherwise the PRs and the
+    repo owner/name come back from one GraphQL query.
     """
+    if _PR_CACHE_REPO is not None:
+        owner, repo = _PR_CACHE_REPO
+        if single_branch is None:
+            return {
+                "owner": owner,
+                "repo": repo,
+                "branches": {branch: BranchInfo(**pr) for branch, pr in _PR_CACHE.items()},
+            }
+        if single_branch in _PR_CACHE:
+            return {
+                "owner": owner,
+                "repo": repo,
+                "branches": {single_branch: BranchInfo(**_PR_CACHE[single_branch])},
+            }
+
     if single_branch:
-        result = run_command(
-            f"gh pr view {single_branch} --json url,baseRefName,headRefName,title --jq '{{url: .url, base: .baseRefName, head: .headRefName, title: .title}}'",
-        )
-        prs_dict: dict[str, BranchInfo] = (
-            {single_branch: eval(result)} if result else {}
-        )
+        owner, repo, prs_dict = _open_prs_for_branches([single_branch])
+        # Remember PRs looked up after the prefetch (e.g. freshly created ones)
+        if _PR_CACHE_REPO is not None:
+            _PR_CACHE.update(prs_dict)
     else:
-        result = run_command(
-            "gh pr list --limit 100 --json headRefName,url,baseRefName,title "
-            "--jq 'map({(.headRefName): {url: .url, base: .baseRefName, title: .title}}) | add'"
+        repository = _query_repository(
+            "pullRequests(states: OPEN, first: 100, "
+            f"orderBy: {{ field: CREATED_AT, direction: DESC }}) {{ {PR_PREFETCH_FIELDS} }}",
+            GH_CACHE_TTL_PR_LIST,
         )
-        prs_dict = eval(result) if result else {}
+        owner, repo = repository["owner"]["login"], repository["name"]
+        prs_dict = {
+            pr["headRefName"]: _branch_info_from_node(pr)
+            for pr in repository["pullRequests"]["nodes"]
+        }
 
-    # use gh to get the owner and repo
-    owner, repo = run_command(
-        "gh repo view --json owner,name --jq '.owner.login,.name'"
-    ).splitlines()
     return {
         "owner": owner,
         "repo": repo,
@@ -432,20 +838,15 @@ PR_NUMBER_PREFIX = "(#"
 PR_NUMBER_SUFFIX = ")"
 
 
-def get_stack_comment_from_pr(branch: str) -> tuple[Optional[str], str]:
+def get_stack_comment_from_pr(branch: str, pr_info: PRInfo) -> tuple[Optional[str], str]:
     """
-    Get the stack comment ID and body from a PR.
+    Find the stack comment among the PR comments already fetched into pr_info.
     Returns (comment_id, comment_body) or (None, "") if no stack comment found.
     """
-    comments = run_command(
-        f"gh pr view {branch} --json comments --jq '.comments[] | {{id: .id, body: .body}}'",
-    ).split("\n")
-
-    for comment in comments:
-        if comment and "body" in comment:
-            comment_data = eval(comment)
-            if comment_data["body"].startswith(STACK_COMMENT_PREFIX):
-                return comment_data["id"], comment_data["body"]
+    branch_info = pr_info["branches"].get(branch)
+    for comment_data in (branch_info or {}).get("comments", []):
+        if comment_data["body"].startswith(STACK_COMMENT_PREFIX):
+            return comment_data["id"], comment_data["body"]
 
     return None, ""
 
@@ -473,41 +874,49 @@ def _format_stack_line(
     return f"{tree_char}{indent} {pr_text}"
 
 
+# Tree characters a stack entry line can start with
+_STACK_TREE_CHARS = (STACK_TREE_BRANCH, STACK_TREE_LAST)
+
+
 def _parse_stack_line(line: str) -> Optional[tuple[str, str]]:
     """
     Parse a stack comment line and extract the PR number and title.
     Returns (pr_number, title) or None if the line is not a valid stack entry.
     This ensures consistent parsing logic between format and parse functions.
+
+    Handles the format [├└][─]* [**]Title (#123)[ ⬅️**]: any number of dashes,
+    optional current branch indicators (also malformed ones, ** without arrow), and
+    titles that span lines or contain "(#n)" themselves, like squash merge titles.
     """
     line = line.strip()
-    if not line or not line.startswith((STACK_TREE_BRANCH, STACK_TREE_LAST)):
+    if not line.startswith(_STACK_TREE_CHARS):
         return None
 
-    # Use regex to parse the line format: ^[├└][─]* [**]?Title (#123)
-    # This handles:
-    # - Tree characters (├ or └) with any number of dashes
-    # - Optional current branch indicators (**...**)
-    # - Title and PR number in format (#123)
-    # - Malformed current indicators (** without arrow)
-
-    # Build regex pattern using our constants for better maintainability
-    tree_chars = re.escape(STACK_TREE_BRANCH) + re.escape(STACK_TREE_LAST)
-    tree_line = re.escape(STACK_TREE_LINE)
-    current_prefix = re.escape(CURRENT_BRANCH_PREFIX)
-    pr_prefix = re.escape(PR_NUMBER_PREFIX)
-    pr_suffix = re.escape(PR_NUMBER_SUFFIX)
-
-    # Single capture group for title, with optional current branch indicators
-    pattern = rf"^[{tree_chars}]{tree_line}*\s+(?:{current_prefix})?(?P<title>.*?)\s+{pr_prefix}(?P<pr_number>\d+){pr_suffix}"
+    # Work back from the end: the optional current marker, then (#123)
+    if line.endswith(CURRENT_BRANCH_SUFFIX):
+        line = line[: -len(CURRENT_BRANCH_SUFFIX)]
+    elif line.endswith(CURRENT_BRANCH_PREFIX):
+        line = line[: -len(CURRENT_BRANCH_PREFIX)]
+    if not line.endswith(PR_NUMBER_SUFFIX):
+        return None
+    number_start = line.rfind(PR_NUMBER_PREFIX)
+    if number_start == -1:
+        return None
+    pr_number = line[number_start + len(PR_NUMBER_PREFIX) : -len(PR_NUMBER_SUFFIX)]
+    if not pr_number.isdecimal():
+        return None
 
-    match = re.match(pattern, line, re.DOTALL)  # DOTALL allows . to match newlines
-    if match:
-        title = match.group("title").strip()
-        pr_number = match.group("pr_number")
+    # What sits between the tree connector and the PR number must be whitespace
+    # separated from both
+    between = line[1:number_start].lstrip(STACK_TREE_LINE)
+    if len(between) < 2 or not between[0].isspace() or not between[-1].isspace():
+        return None
 
-        return pr_number, title
+    title = between.strip()
+    if title.startswith(CURRENT_BRANCH_PREFIX):
+        title = title[len(CURRENT_BRANCH_PREFIX) :].strip()
 
-    return None
+    return pr_number, title
 
 
 def parse_historical_branches_from_comment(
@@ -522,95 +931,127 @@ def parse_historical_branches_from_comment(
         return [], {}
 
     lines = comment_body.split("\n")
-    historical_branches: list[str] = []
-    historical_pr_info: dict[str, BranchInfo] = {}
-
-    # Find the position of the current lowest branch in the comment
-    current_lowest_position = -1
-    current_pr_urls = {
-        branch_info["url"] for branch_info in pr_info["branches"].values()
+    # PR URLs end in the PR number, which is all a stack comment line records
+    current_pr_numbers = {
+        branch_info["url"].rsplit("/", 1)[-1] for branch_info in pr_info["branches"].values()
     }
 
-    # First pass: find where the current lowest branch appears
-    for i, line in enumerate(lines[2:], 2):  # Skip header and trunk
-        parsed = _parse_stack_line(line)
-        if not parsed:
-            continue
-
-        pr_number, _ = parsed
-        pr_url = (
-            f"https://github.com/{pr_info['owner']}/{pr_info['repo']}/pull/{pr_number}"
-        )
-
-        # If this PR is in our current stack, mark this position
-        if pr_url in current_pr_urls:
-            current_lowest_position = i
-            break  # Found the first (lowest) current branch
-
-    # If no current branch found in comment, return empty (can't determine historical context)
-    if current_lowest_position == -1:
-        return [], {}
-
-    # Second pass: collect branches that appear BEFORE the current lowest position
-    for i, line in enumerate(lines[2:], 2):  # Skip header and trunk
-        if i >= current_lowest_position:  # Stop when we reach current branches
-            break
-
+    # Single pass: collect branches until the first (lowest) current branch shows up
+    pending_historicals: list[tuple[str, BranchInfo]] = []
+    for line in lines[2:]:  # Skip header and trunk
         parsed = _parse_stack_line(line)
         if not parsed:
             continue
 
         pr_number, title = parsed
 
-        # This is a historical branch (appears before current lowest)
-        pr_url = (
-            f"https://github.com/{pr_info['owner']}/{pr_info['repo']}/pull/{pr_number}"
+        # Everything seen before the lowest current branch is historical (merged)
+        if pr_number in current_pr_numbers:
+            historical_branches = [branch for branch, _ in pending_historicals]
+            return historical_branches, dict(pending_historicals)
+
+        pending_historicals.append(
+            (
+                f"historical_{pr_number}",
+                {
+                    "url": f"https://github.com/{pr_info['owner']}/{pr_info['repo']}/pull/{pr_number}",
+                    "base": "unknown",  # We don't know the actual base for historical branches
+                    "title": title,
+                },
+            )
         )
-        historical_pr_info[f"historical_{pr_number}"] = {
-            "url": pr_url,
-            "base": "unknown",  # We don't know the actual base for historical branches
-            "title": title,
-        }
-        historical_branches.append(f"historical_{pr_number}")
 
-    return historical_branches, historical_pr_info
+    # If no current branch found in comment, return empty (can't determine historical context)
+    return [], {}
 
 
-def format_stack_comment(stack: list[str], pr_info: PRInfo, current_branch: str) -> str:
-    """Format a comment showing the stack hierarchy with PR numbers and titles."""
+def render_stack_comment_base(
+    stack: list[str], pr_info: PRInfo
+) -> tuple[list[str], dict[str, int]]:
+    """
+    Render the stack comment lines without any current branch marker.
+    Returns (lines, branch_to_line_index) so the same render can be marked for each branch.
+    """
     # Start from trunk
     trunk_branch = get_trunk_branch()
     lines = [STACK_COMMENT_PREFIX, trunk_branch]
+    branch_to_line_index: dict[str, int] = {}
+    branches = pr_info["branches"]
 
     for i, branch in enumerate(stack):
         # Get PR number and title from URL if it exists
         pr_title = "PR pending"
         pr_number = "N/A"
-        if branch in pr_info["branches"]:
-            url = pr_info["branches"][branch]["url"]
-            pr_number = url.split("/")[-1]
-
-            pr_title = pr_info["branches"][branch]["title"]
+        branch_info = branches.get(branch)
+        if branch_info is not None:
+            pr_number = branch_info["url"].rsplit("/", 1)[-1]
+            pr_title = branch_info["title"]
 
         # Use shared formatting utility to ensure consistency with parsing
-        formatted_line = _format_stack_line(
-            i, len(stack), pr_title, pr_number, branch == current_branch
-        )
+        formatted_line = _format_stack_line(i, len(stack), pr_title, pr_number)
+        branch_to_line_index[branch] = len(lines)
         lines.append(formatted_line)
 
-    return "\n".join(lines)
+    return lines, branch_to_line_index
+
+
+def mark_stack_comment(
+    lines: list[str], branch_to_line_index: dict[str, int], current_branch: str
+) -> str:
+    """Join a rendered stack comment, wrapping the current branch's PR text in the marker."""
+    line_index = branch_to_line_index.get(current_branch)
+    if line_index is None:
+        return "\n".join(lines)
+
+    # Tree characters and indent contain no spaces, so the PR text follows the first one
+    line = lines[line_index]
+    split_at = line.index(" ") + 1
+    marked_line = f"{line[:split_at]}{CURRENT_BRANCH_PREFIX}{line[split_at:]}{CURRENT_BRANCH_SUFFIX}"
+    return "\n".join([*lines[:line_index], marked_line, *lines[line_index + 1 :]])
+
+
+def format_stack_comment(stack: list[str], pr_info: PRInfo, current_branch: str) -> str:
+    """Format a comment showing the stack hierarchy with PR numbers and titles."""
+    lines, branch_to_line_index = render_stack_comment_base(stack, pr_info)
+    return mark_stack_comment(lines, branch_to_line_index, current_branch)
+
+
+UPDATE_COMMENT_MUTATION = "mutation($id: ID!, $body: String!) { updateIssueComment(input: { id: $id, body: $body }) { issueComment { bodyText } } }"
+
+
+def batch_update_comments_request(updates: list[tuple[str, str]]) -> str:
+    """
+    Build the JSON request body for one GraphQL mutation that updates several comments,
+    given (comment_id, body) pairs. Everything is passed as variables, so nothing needs escaping.
+    """
+    params = ", ".join(f"$id{i}: ID!, $body{i}: String!" for i in range(len(updates)))
+    fields = " ".join(
+        f"c{i}: updateIssueComment(input: {{ id: $id{i}, body: $body{i} }}) {{ issueComment {{ id }} }}"
+        for i in range(len(updates))
+    )
+    variables: dict[str, str] = {}
+    for i, (comment_id, body) in enumerate(updates):
+        variables[f"id{i}"] = comment_id
+        variables[f"body{i}"] = body
+    return json.dumps({"query": f"mutation({params}) {{ {fields} }}", "variables": variables})
 
 
-def add_stack_comments(stack: list[str], dry_run: bool, submitted_branches: list[str]) -> list[tuple[str, bool, str]]:
+def add_stack_comments(
+    stack: list[str],
+    dry_run: bool,
+    submitted_branches: list[str],
+    pr_info: Optional[PRInfo] = None,
+) -> list[tuple[str, bool, str]]:
     """
     Add comments to submitted PRs and downstack PRs in the stack showing their relationships.
+    If pr_info is given it must already include any newly created PRs; otherwise it is refetched.
     Returns list of (branch, success, error_msg) tuples for each comment update.
     """
     # Get trunk branch
     trunk_branch = get_trunk_branch()
     
-    # Refresh PR info to get all newly created PRs
-    updated_pr_info = get_pr_info()
+    # Refresh PR info to get all newly created PRs, unless the caller kept it up to date
+    updated_pr_info = pr_info if pr_info is not None else get_pr_info()
 
     # Find the lowest branch in the stack that has a PR to use as source of truth
     source_of_truth_comment = ""
@@ -626,7 +1067,9 @@ def add_stack_comments(stack: list[str], dry_run: bool, submitted_branches: list
     extended_pr_info = updated_pr_info
 
     if lowest_branch_with_pr:
-        _, source_of_truth_comment = get_stack_comment_from_pr(lowest_branch_with_pr)
+        _, source_of_truth_comment = get_stack_comment_from_pr(
+            lowest_branch_with_pr, updated_pr_info
+        )
 
         if source_of_truth_comment:
             # Parse historical branches and extend the stack
@@ -643,62 +1086,108 @@ def add_stack_comments(stack: list[str], dry_run: bool, submitted_branches: list
                     branches={**historical_pr_info, **updated_pr_info["branches"]},
                 )
 
-    # Find the lowest submitted branch index efficiently (O(n) with set lookup)
-    submitted_set = set(submitted_branches)  # O(1) lookup
-    lowest_submitted_index = len(stack)
-    for i, branch in enumerate(stack):
-        if branch in submitted_set:  # O(1) lookup
-            lowest_submitted_index = i
-            break
+    # Find the lowest submitted branch via each branch's position in the stack
+    stack_index = {branch: i for i, branch in enumerate(stack)}
+    lowest_submitted_index = min(
+        (stack_index[branch] for branch in submitted_branches if branch in stack_index),
+        default=len(stack),
+    )
 
     # Update submitted branches + all downstack branches that have PRs
-    downstack_branches = (
-        stack[:lowest_submitted_index] if lowest_submitted_index < len(stack) else []
-    )
-    branches_to_update = list(set(submitted_branches + downstack_branches))
+    downstack_branches = stack[:lowest_submitted_index]
+    # dict.fromkeys dedupes while keeping stack order
     branches_to_update = [
         b
-        for b in branches_to_update
+        for b in dict.fromkeys(submitted_branches + downstack_branches)
         if b != trunk_branch and b in updated_pr_info["branches"]
     ]
 
     if not branches_to_update:
         return []
 
+    # Render the extended stack once; each branch only differs in which line is marked
+    base_lines, branch_to_line_index = render_stack_comment_base(
+        extended_stack, extended_pr_info
+    )
+
+    # Mark each branch in the shared render, and note which existing stack comments
+    # already read exactly that way; those are left alone
+    stack_comments: dict[str, str] = {}
+    comment_ids: dict[str, str] = {}
+    results: dict[str, tuple[str, bool, str]] = {}
+    for branch in branches_to_update:
+        stack_comment = mark_stack_comment(base_lines, branch_to_line_index, branch)
+        comment_id, comment_body = get_stack_comment_from_pr(branch, updated_pr_info)
+        if comment_id and comment_body == stack_comment:
+            results[branch] = (branch, True, "")
+            continue
+        stack_comments[branch] = stack_comment
+        if comment_id:
+            comment_ids[branch] = comment_id
+
     def update_single_comment(branch: str) -> tuple[str, bool, str]:
         """Update comment for a single branch. Returns (branch, success, error_msg)."""
         try:
-            # Get comment ID for this branch
-            comment_id, _ = get_stack_comment_from_pr(branch)
-
-            # Generate stack comment using the extended stack (same for all branches)
-            stack_comment = format_stack_comment(extended_stack, extended_pr_info, branch)
+            comment_id = comment_ids.get(branch)
 
+            # The comment body goes over stdin, so no shell quoting is involved
             if comment_id:
                 # Update existing comment using GraphQL API
                 run_update_command(
-                    f'gh api graphql -f id="{comment_id}" -f body="{stack_comment}" -f query=\'mutation($id: ID!, $body: String!) {{ updateIssueComment(input: {{ id: $id, body: $body }}) {{ issueComment {{ bodyText }} }} }}\'',
+                    [
+                        "gh", "api", "graphql",
+                        "-f", f"id={comment_id}",
+                        "-F", "body=@-",
+                        "-f", f"query={UPDATE_COMMENT_MUTATION}",
+                    ],
                     dry_run=dry_run,
+                    stdin=stack_comments[branch],
                 )
             else:
                 # Create new comment
-                escaped_comment = shlex.quote(stack_comment)
                 run_update_command(
-                    f'gh pr comment {branch} --body {escaped_comment}',
+                    ["gh", "pr", "comment", branch, "--body-file", "-"],
                     dry_run=dry_run,
+                    stdin=stack_comments[branch],
                 )
             return (branch, True, "")
         except Exception as e:
             return (branch, False, str(e))
 
-    # Run all comment updates in parallel
-    results = []
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_branch = {executor.submit(update_single_comment, branch): branch for branch in branches_to_update}
-        for future in as_completed(future_to_branch):
-            results.append(future.result())
-    
-    return results
+    def update_comments_batch(branches: list[str]) -> list[tuple[str, bool, str]]:
+        """Update several existing comments with one mutation; they succeed or fail together."""
+        updates = [(comment_ids[branch], stack_comments[branch]) for branch in branches]
+        try:
+            run_update_command(
+                ["gh", "api", "graphql", "--input", "-"],
+                dry_run=dry_run,
+                stdin=batch_update_comments_request(updates),
+            )
+            return [(branch, True, "") for branch in branches]
+        except Exception as e:
+            return [(branch, False, str(e)) for branch in branches]
+
+    # Existing comments are all edited in one round-trip; new comments can only be
+    # added one PR at a time
+    batched_branches = list(comment_ids)
+    if len(batched_branches) < 2:
+        batched_branches = []
+    single_branches = [b for b in stack_comments if b not in batched_branches]
+
+    # Run the remaining comment updates in parallel (each is an independent GitHub
+    # round-trip), then report everything in update order
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        batch_future = (
+            executor.submit(update_comments_batch, batched_branches)
+            if batched_branches
+            else None
+        )
+        for result in executor.map(update_single_comment, single_branches):
+            results[result[0]] = result
+        if batch_future is not None:
+            for result in batch_future.result():
+                results[result[0]] = result
+    return [results[branch] for branch in branches_to_update]
 
 
 def push_branch(branch: str, remote_branch_names: set[str], dry_run: bool) -> tuple[str, bool, str]:
@@ -710,17 +1199,21 @@ def push_branch(branch: str, remote_branch_names: set[str], dry_run: bool) -> tu
         if branch in remote_branch_names:
             # Force-push if branch already exists
             run_update_command(
-                f"git push origin {branch}:{branch} --force-with-lease",
+                ["git", "push", "origin", f"{branch}:{branch}", "--force-with-lease"],
                 dry_run=dry_run,
             )
         else:
             # Normal push if branch is new
-            run_update_command(f"git push origin {branch}:{branch}", dry_run=dry_run)
+            run_update_command(["git", "push", "origin", f"{branch}:{branch}"], dry_run=dry_run)
         return (branch, True, "")
     except Exception as e:
         return (branch, False, str(e))
 
 
+# A pull request URL as printed by `gh pr create` (any GitHub host)
+_PR_URL_RE = re.compile(r"https://\S+/pull/\d+")
+
+
 def create_or_update_pr(
     branch: str,
     parent_branch: str,
@@ -738,33 +1231,51 @@ def create_or_update_pr(
             current_base = branch_info["base"]
             if current_base != parent_branch:
                 run_update_command(
-                    f"gh pr edit {branch} --base {parent_branch}",
+                    ["gh", "pr", "edit", branch, "--base", parent_branch],
                     dry_run=dry_run,
                 )
+                if branch in _PR_CACHE:
+                    _PR_CACHE[branch]["base"] = parent_branch
             return (branch_info["url"], "updated", "")
         else:
             # Derive PR title from the earliest commit on this branch relative to parent
             commit_subjects = run_command(
-                f"git log --reverse --pretty=%s {parent_branch}..{branch}"
+                ["git", "log", "--reverse", "--pretty=%s", f"{parent_branch}..{branch}"]
             ).splitlines()
             if commit_subjects:
                 pr_title = commit_subjects[0]
             else:
-                pr_title = run_command("git log -1 --pretty=%s")
+                pr_title = run_command(["git", "log", "-1", "--pretty=%s"])
 
             if pr_template_path:
-                template_cmd = f"--body-file {shlex.quote(pr_template_path)}"
+                template_args = ["--body-file", pr_template_path]
             else:
-                template_cmd = "--body \"\""
-
-            run_update_command(
-                f"gh pr create --draft --base {parent_branch} --head {branch} --title {shlex.quote(pr_title)} {template_cmd}",
+                template_args = ["--body", ""]
+
+            create_output = run_update_command(
+                [
+                    "gh", "pr", "create", "--draft",
+                    "--base", parent_branch,
+                    "--head", branch,
+                    "--title", pr_title,
+                    *template_args,
+                ],
                 dry_run=dry_run,
             )
-            # Get the new PR URL
-            new_pr_info = get_pr_info(branch)
-            if branch in new_pr_info["branches"]:
-                return (new_pr_info["branches"][branch]["url"], "created", "")
+            # Nothing was created in a dry run, so there's no URL to look for
+            if dry_run:
+                return ("", "to-create", "")
+            # gh prints the new PR URL, so record it without another `gh pr view` round-trip
+            url_match = _PR_URL_RE.search(create_output)
+            if url_match:
+                pr_url = url_match.group(0)
+                new_branch_info = BranchInfo(
+                    url=pr_url, base=parent_branch, title=pr_title, comments=[]
+                )
+                pr_info["branches"][branch] = new_branch_info
+                if _PR_CACHE_REPO is not None:
+                    _PR_CACHE[branch] = BranchInfo(**new_branch_info)
+                return (pr_url, "created", "")
             else:
                 return ("", "to-create", f"PR creation failed for branch: {branch}")
     except Exception as e:
@@ -773,7 +1284,7 @@ def create_or_update_pr(
 
 def get_pr_template_path() -> Optional[str]:
     """Find PR template file if it exists."""
-    repo_root = run_command("git rev-parse --show-toplevel")
+    repo_root = run_command(["git", "rev-parse", "--show-toplevel"])
     candidate_dirs = [
         repo_root,
         os.path.join(repo_root, ".github"),
@@ -839,9 +1350,10 @@ def submit_command(
         sys.exit(1)
 
     print("Parsing the stack...")
-    # Step 2: Parse the stack
+    # Step 2: Parse the stack, indexing each branch's position once
     full_stack = parse_stack()
-    if current_branch not in full_stack:
+    position_by_branch = {branch: i for i, branch in enumerate(full_stack)}
+    if current_branch not in position_by_branch:
         print(f"Error: Current branch '{current_branch}' is not in the stack.")
         sys.exit(1)
 
@@ -892,13 +1404,16 @@ def submit_command(
                     print("Invalid selection. Please choose s/u/d/w.")
                     continue
 
-    current_index = full_stack.index(current_branch)
-    # Determine which branches to submit based on mode
+    current_index = position_by_branch[current_branch]
+    # Determine which branches to submit based on mode, keeping each branch's
+    # position in the full stack so its parent can be looked up
     branches_to_submit: list[tuple[int, str]] = []
     if mode == "single":
         branches_to_submit = [(current_index, current_branch)]
     elif mode == "upstack":
-        branches_to_submit = [(i, b) for i, b in enumerate(full_stack[current_index:])]
+        branches_to_submit = list(
+            enumerate(full_stack[current_index:], start=current_index)
+        )
     elif mode == "downstack":
         branches_to_submit = [
             (i, b) for i, b in enumerate(full_stack[: current_index + 1])
@@ -909,7 +1424,8 @@ def submit_command(
     # Dictionary to collect all PR URLs
     pr_urls: list[tuple[str, str, BranchSubmitStatus]] = []
 
-    # Get all PR info upfront
+    # Get all PR info upfront (one GraphQL round-trip for the whole stack)
+    prefetch_pr_info(full_stack)
     pr_info = get_pr_info()
 
     if mode in ["upstack", "single"]:
@@ -919,28 +1435,27 @@ def submit_command(
     plural = "branch" if len(branches_to_submit) == 1 else "branches"
     print(f"\nSubmitting {len(branches_to_submit)} {plural} in {mode} mode...")
 
-    # Get remote branches once (gtw-15 optimization)
-    print(f"{COLORS['BLUE']}Fetching remote branches...{COLORS['RESET']}")
-    remote_branches = run_command("git ls-remote --heads origin").splitlines()
-    remote_branch_names: set[str] = {
-        line.split("refs/heads/")[1]
-        for line in remote_branches
-        if "refs/heads/" in line
-    }
+    # Get remote branches once (gtw-15 optimization) from the local remote-tracking
+    # refs, which `gt sync` (git pull) keeps current - no network round-trip needed
+    remote_branch_names: set[str] = set(
+        run_command(
+            ["git", "for-each-ref", "--format=%(refname:strip=3)", "refs/remotes/origin"]
+        ).splitlines()
+    )
+    remote_branch_names.discard("HEAD")
 
     # Get PR template path once
     pr_template_path = get_pr_template_path()
 
     # PHASE 1: Push all branches in parallel
     print(f"{COLORS['BLUE']}Pushing {len(branches_to_submit)} {plural}...{COLORS['RESET']}")
-    push_results = []
     with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_branch = {
-            executor.submit(push_branch, branch, remote_branch_names, dry_run): branch
-            for stack_index, branch in branches_to_submit
-        }
-        for future in as_completed(future_to_branch):
-            push_results.append(future.result())
+        push_results = list(
+            executor.map(
+                lambda branch: push_branch(branch, remote_branch_names, dry_run),
+                [branch for _, branch in branches_to_submit],
+            )
+        )
     
     # Check for push failures
     push_failures = [(branch, error) for branch, success, error in push_results if not success]
@@ -955,28 +1470,25 @@ def submit_command(
     # PHASE 2: Create/update all PRs in parallel
     print(f"{COLORS['BLUE']}Creating/updating PRs...{COLORS['RESET']}")
     with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_branch = {}
+        futures = []
         for stack_index, branch in branches_to_submit:
-            assert branch != get_trunk_branch(), (
+            assert branch != trunk_branch, (
                 f"{COLORS['RED']}Error: Cannot submit branch '{branch}' because it is the trunk branch.{COLORS['RESET']}"
             )
             parent_branch = (
-                full_stack[stack_index - 1] if stack_index > 0 else get_trunk_branch()
+                full_stack[stack_index - 1] if stack_index > 0 else trunk_branch
             )
             future = executor.submit(create_or_update_pr, branch, parent_branch, pr_info, pr_template_path, dry_run)
-            future_to_branch[future] = branch
-        
-        for future in as_completed(future_to_branch):
-            branch = future_to_branch[future]
+            futures.append((branch, future))
+
+        # Collect in stack order so the PR list below prints bottom-up
+        for branch, future in futures:
             url, status, error = future.result()
             if error:
                 print(f"{COLORS['YELLOW']}⚠️  {branch}: {error}{COLORS['RESET']}")
                 # Continue anyway, user will see in results
             pr_urls.append((branch, url, status))
 
-    # Return to initial branch
-    run_command(f"git checkout {current_branch}")
-
     # Print all PR URLs immediately
     print("\nPull Requests:")
     for branch, url, status in pr_urls:
@@ -992,7 +1504,10 @@ def submit_command(
     # Update stack references for submitted and downstack PRs (in parallel)
     print(f"\n{COLORS['BLUE']}Updating stack comments...{COLORS['RESET']}")
     submitted_branch_names = [branch for _, branch in branches_to_submit]
-    comment_results = add_stack_comments(full_stack, dry_run, submitted_branch_names)
+    # pr_info was updated in place with any newly created PRs
+    comment_results = add_stack_comments(
+        full_stack, dry_run, submitted_branch_names, pr_info
+    )
     
     # Show results
     if comment_results:
@@ -1027,14 +1542,8 @@ def is_git_alias(command: str) -> bool:
 def get_wrapper_version() -> str:
     """Get the version of the wrapper package from package.json."""
     try:
-        import json
-
-        # Follow symlinks to get the real path of this script
-        script_real_path = os.path.realpath(__file__)
-        script_dir = os.path.dirname(script_real_path)
-
         # package.json should be one level up from bin/
-        package_json_path = os.path.join(script_dir, "..", "package.json")
+        package_json_path = os.path.join(_script_dir(), "..", "package.json")
 
         if os.path.exists(package_json_path):
             with open(package_json_path, "r") as f:
@@ -1045,22 +1554,53 @@ def get_wrapper_version() -> str:
         raise Exception("Failed to get wrapper version")
 
 
+def cached_for_gt_install(cache_file: str, compute: Callable[[], str]) -> str:
+    """
+    Return compute()'s result, cached on disk keyed by the realpath and mtime of the
+    bundled graphite.js, so node only starts again after the bundled CLI is reinstalled.
+    """
+    gt_path = os.path.realpath(get_og_gt_path())
+    cache_key = f"{gt_path}:{os.path.getmtime(gt_path)}"
+    try:
+        with open(cache_file, "rb") as f:
+            cached = cast(dict[str, Any], json.loads(f.read()))
+        if cached.get("key") == cache_key:
+            return cached["output"]
+    except Exception:
+        pass
+
+    output = compute()
+    try:
+        tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(json.dumps({"key": cache_key, "output": output}).encode())
+        os.replace(tmp_file, cache_file)
+    except Exception:
+        pass
+    return output
+
+
+@functools.lru_cache(maxsize=1)
 def get_graphite_version():
     """Get the version of the bundled Graphite CLI."""
     try:
-        output = run_command(f"{OG_GT_PATH} --version", show_output_in_terminal=False)
-        return output.strip()
+        return cached_for_gt_install(
+            get_graphite_version_cache_path(),
+            lambda: run_command([get_og_gt_path(), "--version"], show_output_in_terminal=False).strip(),
+        )
     except Exception:
         return "unknown"
 
 
 def show_version():
     """Show version information for both wrapper and bundled Graphite CLI."""
-    wrapper_version = get_wrapper_version()
-    graphite_version = get_graphite_version()
+    # The Graphite lookup may need a node cold start, so read package.json meanwhile
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        wrapper_version = executor.submit(get_wrapper_version)
+        graphite_version = executor.submit(get_graphite_version)
 
-    print(f"GT Wrapper: {wrapper_version}")
-    print(f"Bundled Graphite CLI: {graphite_version}")
+        print(f"GT Wrapper: {wrapper_version.result()}")
+        print(f"Bundled Graphite CLI: {graphite_version.result()}")
 
 
 def get_cache_file_path() -> str:
@@ -1075,72 +1615,170 @@ def get_cache_file_path() -> str:
     return os.path.join(cache_dir, "version_cache.json")
 
 
+def get_graphite_version_cache_path() -> str:
+    """Get the path for the bundled Graphite CLI version cache file."""
+    return os.path.join(os.path.dirname(get_cache_file_path()), "graphite_version.json")
+
+
+def get_gt_help_cache_path() -> str:
+    """Get the path for the bundled Graphite CLI help cache file."""
+    return os.path.join(os.path.dirname(get_cache_file_path()), "gt_help.json")
+
+
+def get_gt_delete_help_cache_path() -> str:
+    """Get the path for the bundled Graphite CLI `gt delete --help` cache file."""
+    return os.path.join(os.path.dirname(get_cache_file_path()), "gt_delete_help.json")
+
+
+# The version cache as this process last read or wrote it, keyed by its path, so a
+# single gt invocation parses the file at most once
+_version_cache_memo: Optional[tuple[str, dict[str, Any]]] = None
+_version_cache_lock = threading.Lock()
+
+
+def _version_cache_generation() -> Optional[str]:
+    """The wrapper version a version cache belongs to; a self-update starts a fresh cache."""
+    try:
+        return get_wrapper_version()
+    except Exception:
+        return None
+
+
 def load_version_cache() -> dict[str, Any]:
     """Load version check cache from file."""
+    global _version_cache_memo
     cache_file = get_cache_file_path()
+    with _version_cache_lock:
+        if _version_cache_memo is not None and _version_cache_memo[0] == cache_file:
+            # Hand out a copy so callers can modify it before saving
+            return dict(_version_cache_memo[1])
+
+    cache_data: dict[str, Any] = {}
     try:
-        if os.path.exists(cache_file):
-            with open(cache_file, "r") as f:
-                return cast(dict[str, Any], json.load(f))
+        # A missing file is just the exception path, no separate exists() stat; binary
+        # mode hands json the raw bytes without the text-mode decoding layer
+        with open(cache_file, "rb") as f:
+            cache_data = cast(dict[str, Any], json.loads(f.read()))
     except Exception:
         pass
-    return {}
+
+    # Written by a different wrapper version, so e.g. a pending "update available"
+    # notice may already be installed
+    if cache_data and cache_data.get("wrapper_version") != _version_cache_generation():
+        cache_data = {}
+
+    with _version_cache_lock:
+        _version_cache_memo = (cache_file, cache_data)
+    return dict(cache_data)
 
 
 def save_version_cache(cache_data: dict[str, Any]) -> None:
     """Save version check cache to file."""
+    global _version_cache_memo
     cache_file = get_cache_file_path()
+    cache_data = {**cache_data, "wrapper_version": _version_cache_generation()}
+    with _version_cache_lock:
+        _version_cache_memo = (cache_file, cache_data)
     try:
-        with open(cache_file, "w") as f:
-            json.dump(cache_data, f)
+        # Rename into place so a concurrent gt run never reads a partial file.
+        # json.dumps encodes in one C call, where json.dump streams through the
+        # pure-Python encoder
+        tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(json.dumps(cache_data).encode())
+        os.replace(tmp_file, cache_file)
     except Exception:
         pass
 
 
+# npm `latest` changes rarely, so re-check about weekly; the jitter spreads installs
+# out so they don't all hit the registry in the same window
+VERSION_CHECK_INTERVAL = timedelta(days=7)
+VERSION_CHECK_JITTER = 0.1
+# First retry after a failed check; doubles with each consecutive failure
+VERSION_CHECK_RETRY_DELAY = timedelta(hours=1)
+# Per socket operation (connect, each read), so a dead network fails fast
+VERSION_CHECK_TIMEOUT = 2  # seconds
+
+
 def should_check_version() -> bool:
     """Check if we should perform a version check based on cache."""
     cache = load_version_cache()
 
-    if "last_check" not in cache:
-        return True
-
     try:
-        last_check = datetime.fromisoformat(cache["last_check"])
-        # Check once per day
-        return datetime.now() - last_check > timedelta(days=1)
+        if "next_check_ts" in cache:
+            # Plain epoch seconds, so the common path is a float comparison
+            return time.time() >= float(cache["next_check_ts"])
+        if "last_check" in cache:
+            # Caches written before next_check was stored, when last_check was an
+            # ISO timestamp rather than epoch seconds
+            last_check = cache["last_check"]
+            if isinstance(last_check, str):
+                last_check = datetime.fromisoformat(last_check).timestamp()
+            return time.time() - float(last_check) > VERSION_CHECK_INTERVAL.total_seconds()
     except Exception:
-        return True
+        pass
+    return True
 
 
-def get_latest_wrapper_version() -> Optional[str]:
-    """Fetch the latest version from npm registry."""
+def get_latest_wrapper_version(cache: Optional[dict[str, Any]] = None) -> Optional[str]:
+    """
+    Fetch the latest version from npm registry.
+    Given the version cache, the request is conditional on the ETag/Last-Modified
+    stored there: a 304 reuses the cached latest_version, and the validators from
+    a full response are written back into the dict.
+    """
+    # Imported here because urllib.request pulls in http.client, ssl and email, a large
+    # share of startup time on every gt command, and only this weekly check needs it
+    import urllib.error
+    import urllib.request
+
     try:
         # Use npm registry API to get latest version
         url = "https://registry.npmjs.org/@claycoleman/gt-wrapper/latest"
         req = urllib.request.Request(url)
         req.add_header("User-Agent", "gt-wrapper-version-check")
+        if cache and cache.get("latest_version"):
+            if cache.get("etag"):
+                req.add_header("If-None-Match", cache["etag"])
+            if cache.get("last_modified"):
+                req.add_header("If-Modified-Since", cache["last_modified"])
 
-        with urllib.request.urlopen(req, timeout=5) as response:
-            data = json.loads(response.read().decode())
-            return data.get("version")
+        try:
+            with urllib.request.urlopen(req, timeout=VERSION_CHECK_TIMEOUT) as response:
+                # json detects the UTF encoding of raw bytes itself
+                data = json.loads(response.read())
+                if cache is not None:
+                    cache["etag"] = response.headers.get("ETag")
+                    cache["last_modified"] = response.headers.get("Last-Modified")
+                return data.get("version")
+        except urllib.error.HTTPError as e:
+            # Not modified since the last check, so the cached version is still latest
+            if e.code == 304 and cache:
+                return cache.get("latest_version")
+            raise
     except Exception:
         return None
 
 
+# major.minor.patch at the start of a version; any pre-release/build suffix is ignored
+_SEMVER_RE = re.compile(r"^(\d+)\.(\d+)\.(\d+)")
+
+
 def compare_versions(current: str, latest: str) -> bool:
     """Compare version strings. Returns True if latest > current."""
-    try:
+    if current == latest:
+        return False
 
-        def parse_version(v: str) -> tuple[int, int, int]:
-            parts = v.split(".")
-            return (int(parts[0]), int(parts[1]), int(parts[2]))
+    current_match = _SEMVER_RE.match(current)
+    latest_match = _SEMVER_RE.match(latest)
+    if not current_match or not latest_match:
+        return False
 
-        current_parts = parse_version(current)
-        latest_parts = parse_version(latest)
+    current_parts = tuple(map(int, current_match.groups()))
+    latest_parts = tuple(map(int, latest_match.groups()))
 
-        return latest_parts > current_parts
-    except Exception:
-        return False
+    return latest_parts > current_parts
 
 
 def check_for_updates_async() -> None:
@@ -1149,18 +1787,43 @@ def check_for_updates_async() -> None:
         return
 
     current_version = get_wrapper_version()
-    latest_version = get_latest_wrapper_version()
+    previous_cache = load_version_cache()
+    latest_version = get_latest_wrapper_version(previous_cache)
+
+    if latest_version is None:
+        # Offline or registry trouble: keep what we knew and retry sooner than the
+        # normal interval, backing off exponentially while failures continue
+        failures = int(previous_cache.get("failures", 0)) + 1
+        retry_delay = min(
+            VERSION_CHECK_RETRY_DELAY.total_seconds() * 2 ** (failures - 1),
+            VERSION_CHECK_INTERVAL.total_seconds(),
+        )
+        save_version_cache(
+            {
+                **previous_cache,
+                "failures": failures,
+                "next_check_ts": time.time() + retry_delay,
+                "show_notification": False,
+            }
+        )
+        return
 
     # Check if there's an update and we should show notification
-    has_update = latest_version is not None and compare_versions(
-        current_version, latest_version
-    )
+    has_update = compare_versions(current_version, latest_version)
 
     # Update cache - only show notification when we just checked
+    next_check_delay = VERSION_CHECK_INTERVAL.total_seconds() * random.uniform(
+        1 - VERSION_CHECK_JITTER, 1 + VERSION_CHECK_JITTER
+    )
+    now = time.time()
     cache_data = {
-        "last_check": datetime.now().isoformat(),
+        "last_check": now,
+        "next_check_ts": now + next_check_delay,
         "latest_version": latest_version,
         "show_notification": has_update,  # Only show notification when we just checked
+        # Validators for a conditional request next time
+        "etag": previous_cache.get("etag"),
+        "last_modified": previous_cache.get("last_modified"),
     }
     save_version_cache(cache_data)
 
@@ -1194,18 +1857,29 @@ def display_update_notification() -> None:
 
 # Global variable to track background version check
 _version_check_thread: Optional[threading.Thread] = None
+# time.monotonic() by which we stop waiting on the background check
+_version_check_deadline = 0.0
+
+# Longest the version check may delay a command, counted from when it started, so
+# commands that already ran this long never wait on it
+VERSION_CHECK_MAX_DELAY = 0.5  # seconds
 
 
 def start_background_version_check() -> None:
     """Start background version checking if needed."""
-    global _version_check_thread
+    global _version_check_thread, _version_check_deadline
 
     if _version_check_thread is not None:
         return
 
+    # Nobody would see the notification in piped or scripted output
+    if not sys.stdout.isatty():
+        return
+
     if not should_check_version():
         return
 
+    _version_check_deadline = time.monotonic() + VERSION_CHECK_MAX_DELAY
     _version_check_thread = threading.Thread(
         target=check_for_updates_async, daemon=True
     )
@@ -1217,8 +1891,11 @@ def wait_for_version_check_and_notify() -> None:
     global _version_check_thread
 
     if _version_check_thread is not None:
-        # Wait for background check to complete (with timeout)
-        _version_check_thread.join(timeout=0.5)
+        # Wait for background check to complete, but only for whatever is left of
+        # its budget; join returns as soon as the check finishes
+        _version_check_thread.join(
+            timeout=max(0.0, _version_check_deadline - time.monotonic())
+        )
         _version_check_thread = None
 
     # Display notification if update is available
@@ -1226,13 +1903,80 @@ def wait_for_version_check_and_notify() -> None:
 
 
 def get_gt_help():
-    # capture the output of the gt help command, and hide anything from AUTHENTICATING down to TERMS
-    help_output = run_command(f"{OG_GT_PATH} --help", show_output_in_terminal=False)
+    """Get the bundled Graphite CLI's help, reusing it until graphite.js changes."""
+
+    def render_help() -> str:
+        # capture the output of the gt help command, and hide anything from AUTHENTICATING down to TERMS
+        help_output = run_command([get_og_gt_path(), "--help"], show_output_in_terminal=False)
 
-    # split on AUTHENTICATING
-    pre_authenticating = help_output.split("AUTHENTICATING")[0]
-    post_terms = help_output.split("TERMS")[1]
-    return pre_authenticating + "TERMS" + post_terms
+        # split on AUTHENTICATING
+        pre_authenticating = help_output.split("AUTHENTICATING")[0]
+        post_terms = help_output.split("TERMS")[1]
+        return pre_authenticating + "TERMS" + post_terms
+
+    return cached_for_gt_install(get_gt_help_cache_path(), render_help)
+
+
+# Graphite CLI commands and aliases the wrapper passes straight through
+# fmt: off
+_KNOWN_GT_COMMANDS = frozenset({
+    # Setup commands
+    "auth", "init",
+    
+    # Core workflow commands  
+    "create", "c",  # create alias
+    "modify", "m",  # modify alias
+    "submit", "s",  # submit alias
+    "sync",
+    
+    # Stack navigation
+    "bottom", "b",     # bottom alias
+    "checkout", "co",  # checkout alias  
+    "down", "d",       # down alias
+    "top", "t",        # top alias
+    "trunk",
+    "up", "u",         # up alias
+    
+    # Branch info
+    "children", "info", 
+    "log", "l",        # log alias
+    "parent",
+    
+    # Stack management
+    "absorb", "ab",    # absorb alias
+    "continue", "cont", # continue alias
+    "fold", "move", "reorder",
+    "restack", "r",    # restack alias
+    
+    # Branch management
+    "delete", "dl",    # delete alias
+    "get", "pop", 
+    "rename", "rn",    # rename alias
+    "revert", 
+    "split", "sp",     # split alias
+    "squash", "sq",    # squash alias
+    "track", "tr",     # track alias
+    "untrack", "utr",  # untrack alias
+    
+    # Graphite web
+    "dash", 
+    "interactive", "i", # interactive alias
+    "merge", "pr",
+    
+    # Configuration
+    "aliases", "completion", "config", "fish",
+    
+    # Learning & help
+    "changelog", "demo", "docs", "feedback",
+    "guide", "g",      # guide alias
+    
+    # Hidden
+    "state",
+    
+    # Other common commands
+    "help", "version"
+})
+# fmt: on
 
 
 def is_valid_gt_command(command: str) -> bool:
@@ -1243,68 +1987,7 @@ def is_valid_gt_command(command: str) -> bool:
     The best approach would be to try to run the command with --help and see if it mentions an error in the output,
     as gt isn't returning non-zero exit codes for unknown commands.
     """
-
-    # fmt: off
-    known_commands = {
-        # Setup commands
-        "auth", "init",
-        
-        # Core workflow commands  
-        "create", "c",  # create alias
-        "modify", "m",  # modify alias
-        "submit", "s",  # submit alias
-        "sync",
-        
-        # Stack navigation
-        "bottom", "b",     # bottom alias
-        "checkout", "co",  # checkout alias  
-        "down", "d",       # down alias
-        "top", "t",        # top alias
-        "trunk",
-        "up", "u",         # up alias
-        
-        # Branch info
-        "children", "info", 
-        "log", "l",        # log alias
-        "parent",
-        
-        # Stack management
-        "absorb", "ab",    # absorb alias
-        "continue", "cont", # continue alias
-        "fold", "move", "reorder",
-        "restack", "r",    # restack alias
-        
-        # Branch management
-        "delete", "dl",    # delete alias
-        "get", "pop", 
-        "rename", "rn",    # rename alias
-        "revert", 
-        "split", "sp",     # split alias
-        "squash", "sq",    # squash alias
-        "track", "tr",     # track alias
-        "untrack", "utr",  # untrack alias
-        
-        # Graphite web
-        "dash", 
-        "interactive", "i", # interactive alias
-        "merge", "pr",
-        
-        # Configuration
-        "aliases", "completion", "config", "fish",
-        
-        # Learning & help
-        "changelog", "demo", "docs", "feedback",
-        "guide", "g",      # guide alias
-        
-        # Hidden
-        "state",
-        
-        # Other common commands
-        "help", "version"
-    }
-    # fmt: on
-
-    return command in known_commands
+    return command in _KNOWN_GT_COMMANDS
 
 
 def create_sync_parser() -> argparse.ArgumentParser:
@@ -1334,6 +2017,11 @@ def create_sync_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Automatically delete merged branches without prompting"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always query GitHub instead of reusing recent results"
+    )
     return parser
 
 
@@ -1370,6 +2058,11 @@ def create_submit_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Run in dry-run mode (no changes made)"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always query GitHub instead of reusing recent results"
+    )
     return parser
 
 
@@ -1402,7 +2095,7 @@ def diff_command(no_working: bool, staged_only: bool, working_only: bool) -> Non
     """Execute the df command functionality."""
     # Handle working-only mode first (just uncommitted changes)
     if working_only:
-        run_uncaptured_command("git diff HEAD")
+        run_uncaptured_command(["git", "diff", "HEAD"])
         return
     
     # Resolve Graphite trunk and parent
@@ -1414,24 +2107,96 @@ def diff_command(no_working: bool, staged_only: bool, working_only: bool) -> Non
         return
     
     # Determine parent via Graphite
-    parent_branch = current_branch if current_branch == trunk_branch else run_command(f"{OG_GT_PATH} parent")
+    parent_branch = current_branch if current_branch == trunk_branch else run_command([get_og_gt_path(), "parent"])
 
     # Calculate merge-base between parent and HEAD
-    merge_base = run_command(f"git merge-base {parent_branch} HEAD")
+    merge_base = run_command(["git", "merge-base", parent_branch, "HEAD"])
 
     # Build and run appropriate git diff
     if no_working:
         # committed-only diff unique to current branch
-        cmd = f"git diff {merge_base} HEAD"
+        cmd = ["git", "diff", merge_base, "HEAD"]
     elif staged_only:
         # committed + staged (no unstaged)
-        cmd = f"git diff --staged {merge_base}"
+        cmd = ["git", "diff", "--staged", merge_base]
     else:
         # Default: include committed + staged + unstaged
-        cmd = f"git diff {merge_base}"
+        cmd = ["git", "diff", merge_base]
     run_uncaptured_command(cmd)
 
 
+def parse_command_args(parser: argparse.ArgumentParser, argv: list[str]) -> argparse.Namespace:
+    """Parse a custom command's arguments, still showing the update notification on errors."""
+    try:
+        return parser.parse_args(argv)
+    except SystemExit:
+        # argparse calls sys.exit on error, but we want to show update notification
+        wait_for_version_check_and_notify()
+        raise
+
+
+def sync_main(argv: list[str]) -> None:
+    args = parse_command_args(create_sync_parser(), argv)
+    if args.no_cache:
+        disable_gh_cache()
+    sync_command(
+        dry_run=args.dry_run,
+        skip_restack=args.skip_restack,
+        current_stack=args.current_stack,
+        assume_yes=args.yes,
+    )
+
+
+def df_main(argv: list[str]) -> None:
+    args = parse_command_args(create_diff_parser(), argv)
+    # --staged has no effect with --no-working
+    diff_command(
+        no_working=args.no_working,
+        staged_only=(args.staged and not args.no_working),
+        working_only=args.working_only
+    )
+
+
+def submit_main(argv: list[str]) -> None:
+    args = parse_command_args(create_submit_parser(), argv)
+
+    # Determine mode from parsed arguments
+    mode = "unset"
+    if args.single:
+        mode = "single"
+    elif args.upstack:
+        mode = "upstack"
+    elif args.downstack:
+        mode = "downstack"
+    elif args.whole_stack:
+        mode = "whole-stack"
+
+    if args.no_cache:
+        disable_gh_cache()
+    submit_command(mode=mode, dry_run=args.dry_run)
+
+
+def passthrough_command(gt_args: list[str]) -> None:
+    """Hand anything that isn't a custom command to gt, or to git for git aliases."""
+    # TODO: try to filter out gt upgrade messages from the output
+    # requires switching to run_command but need to figure out why i didn't
+    # do this originally, i believe it's because it either broke formatting
+    # or broke some interactive features
+    command = gt_args[0]
+    if not is_valid_gt_command(command) and is_git_alias(command):
+        run_uncaptured_command(["git", *gt_args])
+    else:
+        run_uncaptured_command([get_og_gt_path(), *gt_args])
+
+
+# The wrapper's own commands; everything else is passed through
+_COMMAND_HANDLERS: dict[str, Callable[[list[str]], None]] = {
+    "sync": sync_main,
+    "df": df_main,
+    "submit": submit_main,
+}
+
+
 def main():
     # Start background version check early
     start_background_version_check()
@@ -1447,6 +2212,7 @@ def main():
         print("    --skip-restack, -sr Skip running 'gt restack' at the end")
         print("    --current-stack, -cs Sync only the current stack branches")
         print("    --yes, -y           Delete merged branches without prompts")
+        print("    --no-cache          Always query GitHub instead of reusing recent results")
         print("  submit options:")
         print("    --single, -si       Submit only the current branch")
         print(
@@ -1457,6 +2223,7 @@ def main():
         )
         print("    --whole-stack, -w   Submit all branches in the stack")
         print("    --dry-run, -d       Run in dry-run mode (no changes made)")
+        print("    --no-cache          Always query GitHub instead of reusing recent results")
         print("  df (diff) options:")
         print("    -nw, --no-working   Exclude working directory and index; show only committed diff")
         print("    -s, --staged        Include staged changes but exclude unstaged")
@@ -1478,70 +2245,11 @@ def main():
         wait_for_version_check_and_notify()
         sys.exit(0)
 
-    if command == "sync":
-        parser = create_sync_parser()
-        try:
-            args = parser.parse_args(sys.argv[2:])
-        except SystemExit:
-            # argparse calls sys.exit on error, but we want to show update notification
-            wait_for_version_check_and_notify()
-            raise
-            
-        sync_command(
-            dry_run=args.dry_run,
-            skip_restack=args.skip_restack, 
-            current_stack=args.current_stack,
-            assume_yes=args.yes,
-        )
-    elif command == "df":
-        parser = create_diff_parser()
-        try:
-            args = parser.parse_args(sys.argv[2:])
-        except SystemExit:
-            # argparse calls sys.exit on error, but we want to show update notification
-            wait_for_version_check_and_notify()
-            raise
-
-        # --staged has no effect with --no-working
-        diff_command(
-            no_working=args.no_working,
-            staged_only=(args.staged and not args.no_working),
-            working_only=args.working_only
-        )
-    elif command == "submit":
-        parser = create_submit_parser()
-        try:
-            args = parser.parse_args(sys.argv[2:])
-        except SystemExit:
-            # argparse calls sys.exit on error, but we want to show update notification
-            wait_for_version_check_and_notify()
-            raise
-            
-        # Determine mode from parsed arguments
-        mode = "unset"
-        if args.single:
-            mode = "single"
-        elif args.upstack:
-            mode = "upstack"
-        elif args.downstack:
-            mode = "downstack"
-        elif args.whole_stack:
-            mode = "whole-stack"
-            
-        submit_command(mode=mode, dry_run=args.dry_run)
+    handler = _COMMAND_HANDLERS.get(command)
+    if handler is not None:
+        handler(sys.argv[2:])
     else:
-        gt_args = " ".join(f'"{arg}"' if " " in arg else arg for arg in sys.argv[1:])
-        if is_valid_gt_command(command):
-            # TODO: try to filter out gt upgrade messages from the output
-            # requires switching to run_command but need to figure out why i didn't
-            # do this originally, i believe it's because it either broke formatting 
-            # or broke some interactive features
-            run_uncaptured_command(f"{OG_GT_PATH} {gt_args}")
-        elif is_git_alias(command):
-            run_uncaptured_command(f"git {gt_args}")
-        else:
-            # TODO: see above TODO about filtering out gt upgrade messages
-            run_uncaptured_command(f"{OG_GT_PATH} {gt_args}")
+        passthrough_command(sys.argv[1:])
 
     # Show update notification at the end of successful command execution
     wait_for_version_check_and_notify()
@@ -5,6 +5,7 @@ Test suite for filter_graphite_warnings functionality in gt_commands.py
 
 import unittest
 from unittest.mock import patch, MagicMock
+import subprocess
 import sys
 import os
 
@@ -110,36 +111,21 @@ Final result"""
 class TestRunCommandWithFiltering(unittest.TestCase):
     """Test the run_command function with warning filtering"""
 
-    @patch("gt_commands.subprocess.Popen")
-    def test_run_command_filters_warnings(self, mock_popen):
+    @patch("gt_commands.subprocess.run")
+    def test_run_command_filters_warnings(self, mock_run):
         """Test that run_command properly filters Graphite warnings"""
-        # Mock the process
-        mock_process = MagicMock()
-        mock_process.wait.return_value = 0
-        mock_process.returncode = 0
-
         # Mock stdout with warnings
         command_output_with_warnings = f"""{GRAPHITE_VERSION_WARNING}
   ◯ main
   ◉ feature_a
   ◯ feature_b"""
 
-        # Mock readline to return lines one by one, then empty string to end
-        lines = command_output_with_warnings.split("\n")
-        mock_process.stdout.readline.side_effect = [line + "\n" for line in lines] + [
-            ""
-        ]
-        mock_process.stderr.read.return_value = ""
-
-        # Set up the mock to return our process
-        mock_popen.return_value = mock_process
-
-        # Mock poll to return None while reading, then 0 when finished
-        # Need enough None values for all the readline calls, then 0
-        mock_process.poll.side_effect = [None] * len(lines) + [0]
+        mock_run.return_value = subprocess.CompletedProcess(
+            ["gt", "ls", "--stack"], 0, stdout=command_output_with_warnings + "\n", stderr=""
+        )
 
         # Run the command
-        result = run_command("gt ls --stack")
+        result = run_command(["gt", "ls", "--stack"])
 
         # Verify warnings were filtered out
         expected = """◯ main
@@ -148,115 +134,66 @@ class TestRunCommandWithFiltering(unittest.TestCase):
 
         self.assertEqual(result, expected)
 
-    @patch("gt_commands.subprocess.Popen")
-    def test_run_command_no_warnings(self, mock_popen):
+    @patch("gt_commands.subprocess.run")
+    def test_run_command_no_warnings(self, mock_run):
         """Test that run_command passes through normal output unchanged"""
-        # Mock the process
-        mock_process = MagicMock()
-        mock_process.wait.return_value = 0
-        mock_process.returncode = 0
-
         # Mock stdout without warnings
         command_output = """  ◯ main
   ◉ feature_a
   ◯ feature_b"""
 
-        # Mock readline to return lines one by one, then empty string to end
-        lines = command_output.split("\n")
-        mock_process.stdout.readline.side_effect = [line + "\n" for line in lines] + [
-            ""
-        ]
-        mock_process.stderr.read.return_value = ""
-
-        # Set up the mock to return our process
-        mock_popen.return_value = mock_process
-
-        # Mock poll to return None while reading, then 0 when finished
-        mock_process.poll.side_effect = [None] * len(lines) + [0]
+        mock_run.return_value = subprocess.CompletedProcess(
+            ["gt", "ls", "--stack"], 0, stdout=command_output + "\n", stderr=""
+        )
 
         # Run the command
-        result = run_command("gt ls --stack")
+        result = run_command(["gt", "ls", "--stack"])
 
         # Verify output is stripped (run_command calls .strip())
         expected = command_output.strip()
         self.assertEqual(result, expected)
 
-    @patch("gt_commands.subprocess.Popen")
-    def test_run_command_empty_output(self, mock_popen):
-        """Test that run_command handles empty output correctly"""
-        # Mock the process
-        mock_process = MagicMock()
-        mock_process.wait.return_value = 0
-        mock_process.returncode = 0
-
-        # Mock empty stdout - readline returns empty string immediately
-        mock_process.stdout.readline.side_effect = [""]
-        mock_process.stderr.read.return_value = ""
-
-        # Set up the mock to return our process
-        mock_popen.return_value = mock_process
+        # The argv list is executed directly, not through a shell
+        self.assertEqual(mock_run.call_args.args[0], ["gt", "ls", "--stack"])
+        self.assertFalse(mock_run.call_args.kwargs.get("shell", False))
 
-        # Mock poll to return 0 immediately (process finished with no output)
-        mock_process.poll.side_effect = [0]
+    @patch("gt_commands.subprocess.run")
+    def test_run_command_empty_output(self, mock_run):
+        """Test that run_command handles empty output correctly"""
+        mock_run.return_value = subprocess.CompletedProcess(
+            ["gt", "--version"], 0, stdout="", stderr=""
+        )
 
         # Run the command
-        result = run_command("gt --version")
+        result = run_command(["gt", "--version"])
 
         # Verify empty output is handled
         self.assertEqual(result, "")
 
-    @patch("gt_commands.subprocess.Popen")
-    def test_run_command_warning_only_output(self, mock_popen):
+    @patch("gt_commands.subprocess.run")
+    def test_run_command_warning_only_output(self, mock_run):
         """Test that run_command handles output that's only warnings"""
-        # Mock the process
-        mock_process = MagicMock()
-        mock_process.wait.return_value = 0
-        mock_process.returncode = 0
-
-        # Mock stdout with only warnings
-        warning_only_output = GRAPHITE_VERSION_WARNING
-
-        # Mock readline to return lines one by one, then empty string to end
-        lines = warning_only_output.split("\n")
-        mock_process.stdout.readline.side_effect = [line + "\n" for line in lines] + [
-            ""
-        ]
-        mock_process.stderr.read.return_value = ""
-
-        # Set up the mock to return our process
-        mock_popen.return_value = mock_process
-
-        # Mock poll to return None while reading, then 0 when finished
-        mock_process.poll.side_effect = [None] * len(lines) + [0]
+        mock_run.return_value = subprocess.CompletedProcess(
+            ["gt", "--version"], 0, stdout=GRAPHITE_VERSION_WARNING + "\n", stderr=""
+        )
 
         # Run the command
-        result = run_command("gt --version")
+        result = run_command(["gt", "--version"])
 
         # Verify all warnings were filtered out, leaving empty result
         self.assertEqual(result, "")
 
-    @patch("gt_commands.subprocess.Popen")
-    def test_run_command_handles_failure(self, mock_popen):
+    @patch("gt_commands.subprocess.run")
+    def test_run_command_handles_failure(self, mock_run):
         """Test that run_command handles command failure correctly"""
-        # Mock the process
-        mock_process = MagicMock()
-        mock_process.wait.return_value = 1  # Non-zero exit code
-        mock_process.returncode = 1
-
-        # Mock stdout and stderr
-        mock_process.stdout.readline.side_effect = ["Some output\n", ""]
-        mock_process.stderr.read.return_value = "Error occurred"
-
-        # Set up the mock to return our process
-        mock_popen.return_value = mock_process
-
-        # Mock poll to return None once (process running) then 1 (finished with error)
-        mock_process.poll.side_effect = [None, 1]
+        mock_run.return_value = subprocess.CompletedProcess(
+            ["gt", "invalid-command"], 1, stdout="Some output\n", stderr="Error occurred"
+        )
 
         # Run the command - should exit with error
         with patch("builtins.print") as mock_print:
             with self.assertRaises(SystemExit) as cm:
-                run_command("gt invalid-command")
+                run_command(["gt", "invalid-command"])
 
         # Verify exit code was 1
         self.assertEqual(cm.exception.code, 1)
@@ -264,6 +201,44 @@ class TestRunCommandWithFiltering(unittest.TestCase):
         # Verify error was printed
         mock_print.assert_called()
 
+    @patch("gt_commands.os.read")
+    @patch("gt_commands.subprocess.Popen")
+    def test_run_command_streams_output(self, mock_popen, mock_read):
+        """Test that run_command streams output when showing it in the terminal"""
+        # Mock the process
+        mock_process = MagicMock()
+        mock_process.wait.return_value = 0
+        mock_popen.return_value.__enter__.return_value = mock_process
+
+        # Mock stdout with warnings, delivered in two raw chunks then EOF
+        command_output_with_warnings = f"""{GRAPHITE_VERSION_WARNING}
+  ◯ main
+  ◉ feature_a
+""".encode()
+        chunks = [command_output_with_warnings[:40], command_output_with_warnings[40:]]
+        mock_read.side_effect = chunks + [b""]
+
+        # Run the command
+        with patch("gt_commands.sys.stdout") as mock_stdout:
+            result = run_command(["gt", "ls", "--stack"], show_output_in_terminal=True)
+
+        # Every chunk was passed through as it arrived, and warnings are still filtered
+        written = [call.args[0] for call in mock_stdout.buffer.write.call_args_list]
+        self.assertEqual(written, chunks)
+        self.assertEqual(result, "◯ main\n  ◉ feature_a")
+
+    def test_run_command_streaming_survives_large_stderr(self):
+        """Test that streaming drains stderr along with stdout instead of deadlocking"""
+        script = 'import sys; sys.stderr.write("x" * 300000 + "\\n"); sys.stderr.flush(); print("done")'
+        with patch("gt_commands.sys.stdout") as mock_stdout:
+            mock_stdout.isatty.return_value = False
+            result = run_command(
+                [sys.executable, "-c", script], show_output_in_terminal=True
+            )
+
+        # stderr is shown in the stream too
+        self.assertEqual(result, "x" * 300000 + "\ndone")
+
 
 if __name__ == "__main__":
     unittest.main()
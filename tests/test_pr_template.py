@@ -12,15 +12,14 @@ import sys
 # Add the bin directory to the path so we can import gt_commands
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
 
-from gt_commands import submit_branch, PRInfo
+from gt_commands import create_or_update_pr, get_pr_template_path, submit_command, PRInfo
 
 
 class TestPrTemplateBehavior(unittest.TestCase):
-    @patch("gt_commands.get_pr_info")
     @patch("gt_commands.run_update_command")
     @patch("gt_commands.run_command")
-    def test_uses_body_file_when_template_present(self, mock_run_command, mock_run_update_command, mock_get_pr_info):
-        """submit_branch should use --body-file and set --title when template exists"""
+    def test_uses_body_file_when_template_present(self, mock_run_command, mock_run_update_command):
+        """create_or_update_pr should use --body-file and set --title when template exists"""
         with tempfile.TemporaryDirectory() as repo_root:
             # Create .github/pull_request_template.md
             gh_dir = os.path.join(repo_root, ".github")
@@ -33,89 +32,142 @@ class TestPrTemplateBehavior(unittest.TestCase):
             parent = "main"
 
             # Mock run_command responses
-            def run_cmd_side_effect(cmd: str, show_output_in_terminal: bool = False):
-                if cmd.startswith("git rev-parse --show-toplevel"):
+            def run_cmd_side_effect(cmd: list[str], show_output_in_terminal: bool = False):
+                if cmd[:2] == ["git", "rev-parse"]:
                     return repo_root
-                if cmd.startswith("git ls-remote --heads origin"):
-                    return ""  # no remote branches
-                if cmd.startswith("git log --reverse --pretty=%s"):
+                if cmd[:3] == ["git", "log", "--reverse"]:
                     return "feat: initial\nfeat: second"
-                if cmd.startswith("git log -1 --pretty=%s"):
+                if cmd[:3] == ["git", "log", "-1"]:
                     return "feat: latest"
                 return ""
 
             mock_run_command.side_effect = run_cmd_side_effect
 
-            # Capture run_update_command calls
-            captured_commands = []
-            def capture_update(cmd: str, dry_run: bool, show_output_in_terminal: bool = False):
-                captured_commands.append(cmd)
-                return ""  # simulate dry run
-
-            mock_run_update_command.side_effect = capture_update
-
-            # After creation, ensure get_pr_info returns the new PR so submit_branch finishes
-            mock_get_pr_info.return_value = PRInfo(owner="o", repo="r", branches={
-                branch: {"url": "https://github.com/o/r/pull/1", "base": parent, "title": "t"}
-            })
+            # gh pr create prints the new PR URL
+            mock_run_update_command.return_value = "https://github.com/o/r/pull/1"
 
             # Run
-            url, status = submit_branch(branch, parent, True, PRInfo(owner="o", repo="r", branches={}))
+            found_template = get_pr_template_path()
+            pr_info = PRInfo(owner="o", repo="r", branches={})
+            url, status, error = create_or_update_pr(
+                branch, parent, pr_info, found_template, False
+            )
 
             # Validate that gh pr create was called with body-file and title
-            gh_calls = [c for c in captured_commands if c.startswith("gh pr create")]
+            self.assertEqual(found_template, template_path)
+            gh_calls = [
+                call.args[0] for call in mock_run_update_command.call_args_list
+                if call.args[0][:3] == ["gh", "pr", "create"]
+            ]
             self.assertTrue(gh_calls, "gh pr create was not called")
             create_cmd = gh_calls[-1]
-            self.assertIn("--body-file", create_cmd)
-            self.assertIn(template_path, create_cmd)
-            self.assertIn("--title", create_cmd)
+            self.assertEqual(create_cmd[create_cmd.index("--body-file") + 1], template_path)
+            self.assertEqual(create_cmd[create_cmd.index("--title") + 1], "feat: initial")
             self.assertEqual(status, "created")
+            self.assertEqual(error, "")
+            self.assertEqual(url, "https://github.com/o/r/pull/1")
+            # The new PR is recorded for the stack comment step without refetching
+            self.assertEqual(
+                pr_info["branches"][branch],
+                {"url": url, "base": parent, "title": "feat: initial", "comments": []},
+            )
 
-    @patch("gt_commands.get_pr_info")
     @patch("gt_commands.run_update_command")
     @patch("gt_commands.run_command")
-    def test_uses_empty_body_when_no_template(self, mock_run_command, mock_run_update_command, mock_get_pr_info):
-        """submit_branch should use --body "" and set --title when no template exists"""
+    def test_uses_empty_body_when_no_template(self, mock_run_command, mock_run_update_command):
+        """create_or_update_pr should use --body "" and set --title when no template exists"""
         with tempfile.TemporaryDirectory() as repo_root:
             branch = "feature/no-template"
             parent = "main"
 
-            def run_cmd_side_effect(cmd: str, show_output_in_terminal: bool = False):
-                if cmd.startswith("git rev-parse --show-toplevel"):
+            def run_cmd_side_effect(cmd: list[str], show_output_in_terminal: bool = False):
+                if cmd[:2] == ["git", "rev-parse"]:
                     return repo_root
-                if cmd.startswith("git ls-remote --heads origin"):
-                    return ""  # no remote branches
-                if cmd.startswith("git log --reverse --pretty=%s"):
+                if cmd[:3] == ["git", "log", "--reverse"]:
                     return "feat: only"
-                if cmd.startswith("git log -1 --pretty=%s"):
+                if cmd[:3] == ["git", "log", "-1"]:
                     return "feat: latest"
                 return ""
 
             mock_run_command.side_effect = run_cmd_side_effect
 
-            captured_commands = []
-            def capture_update(cmd: str, dry_run: bool, show_output_in_terminal: bool = False):
-                captured_commands.append(cmd)
-                return ""
-
-            mock_run_update_command.side_effect = capture_update
-
-            mock_get_pr_info.return_value = PRInfo(owner="o", repo="r", branches={
-                branch: {"url": "https://github.com/o/r/pull/2", "base": parent, "title": "t"}
-            })
-
-            url, status = submit_branch(branch, parent, True, PRInfo(owner="o", repo="r", branches={}))
-
-            gh_calls = [c for c in captured_commands if c.startswith("gh pr create")]
+            # Anything else gh prints around the URL is ignored
+            mock_run_update_command.return_value = (
+                "Warning: 1 uncommitted change\nhttps://github.com/o/r/pull/2\n"
+            )
+
+            found_template = get_pr_template_path()
+            url, status, error = create_or_update_pr(
+                branch, parent, PRInfo(owner="o", repo="r", branches={}), found_template, False
+            )
+
+            self.assertIsNone(found_template)
+            gh_calls = [
+                call.args[0] for call in mock_run_update_command.call_args_list
+                if call.args[0][:3] == ["gh", "pr", "create"]
+            ]
             self.assertTrue(gh_calls, "gh pr create was not called")
             create_cmd = gh_calls[-1]
-            self.assertIn("--body \"\"", create_cmd)
-            self.assertIn("--title", create_cmd)
+            self.assertEqual(create_cmd[create_cmd.index("--body") + 1], "")
+            self.assertEqual(create_cmd[create_cmd.index("--title") + 1], "feat: only")
             self.assertNotIn("--body-file", create_cmd)
             self.assertEqual(status, "created")
+            self.assertEqual(url, "https://github.com/o/r/pull/2")
+
+    @patch("gt_commands.run_update_command", return_value="")
+    @patch("gt_commands.run_command", return_value="feat: only")
+    def test_dry_run_create_reports_to_create(self, mock_run_command, mock_run_update_command):
+        """create_or_update_pr should report to-create without an error in a dry run"""
+        pr_info = PRInfo(owner="o", repo="r", branches={})
+        url, status, error = create_or_update_pr(
+            "feature/dry", "main", pr_info, None, True
+        )
+
+        self.assertEqual((url, status, error), ("", "to-create", ""))
+        self.assertNotIn("feature/dry", pr_info["branches"])
+
+    @patch("gt_commands.run_update_command", return_value="something went wrong\n")
+    @patch("gt_commands.run_command", return_value="feat: only")
+    def test_create_without_url_reports_failure(self, mock_run_command, mock_run_update_command):
+        """create_or_update_pr should report a failure when a real gh pr create printed no URL"""
+        url, status, error = create_or_update_pr(
+            "feature/x", "main", PRInfo(owner="o", repo="r", branches={}), None, False
+        )
+
+        self.assertEqual((url, status), ("", "to-create"))
+        self.assertEqual(error, "PR creation failed for branch: feature/x")
+
+
+class TestSubmitParents(unittest.TestCase):
+    @patch("gt_commands.add_stack_comments", return_value=[])
+    @patch("gt_commands.create_or_update_pr", return_value=("", "updated", ""))
+    @patch("gt_commands.push_branch", side_effect=lambda branch, *_: (branch, True, ""))
+    @patch("gt_commands.get_pr_template_path", return_value=None)
+    @patch("gt_commands.run_command", return_value="")
+    @patch("gt_commands.get_pr_info")
+    @patch("gt_commands.prefetch_pr_info")
+    @patch("gt_commands.parse_stack", return_value=["feature_a", "feature_b", "feature_c"])
+    @patch("gt_commands.get_local_branches", return_value={"feature_a", "feature_b", "feature_c"})
+    @patch("gt_commands.get_current_branch", return_value="feature_b")
+    @patch("gt_commands.get_trunk_branch", return_value="main")
+    @patch("builtins.print")
+    def test_upstack_submit_uses_full_stack_parents(
+        self, mock_print, mock_trunk, mock_current, mock_locals, mock_parse_stack,
+        mock_prefetch, mock_get_pr_info, mock_run_command, mock_template,
+        mock_push_branch, mock_create_or_update_pr, mock_add_stack_comments,
+    ):
+        """Upstack submit should base each PR on the branch below it in the full stack"""
+        mock_get_pr_info.return_value = PRInfo(owner="o", repo="r", branches={
+            "feature_a": {"url": "https://github.com/o/r/pull/1", "base": "main", "title": "a"},
+        })
+
+        submit_command(mode="upstack", dry_run=True)
+
+        parents = {
+            call.args[0]: call.args[1] for call in mock_create_or_update_pr.call_args_list
+        }
+        self.assertEqual(parents, {"feature_b": "feature_a", "feature_c": "feature_b"})
 
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
-
-
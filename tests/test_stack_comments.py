@@ -4,6 +4,7 @@ Focused tests for the pure stack parsing function.
 """
 
 import unittest
+from unittest.mock import patch
 import sys
 import os
 
@@ -54,6 +55,14 @@ class TestParseStackPure(unittest.TestCase):
             ["fix.hot.issue", "user/name_with_underscores", "feature/kebab-case"],
         )
 
+    def test_branching_stack_exits(self):
+        output = """◯ main
+◯─┐ feature_a
+│ ◯ feature_b
+◯ feature_c"""
+        with patch("builtins.print"), self.assertRaises(SystemExit):
+            parse_stack_from_output(output)
+
 #!/usr/bin/env python3
 """
 Test suite for stack comment functionality in gt_commands.py
@@ -61,6 +70,8 @@ Test suite for stack comment functionality in gt_commands.py
 
 import unittest
 from unittest.mock import patch, MagicMock
+import copy
+import json
 import sys
 import os
 
@@ -84,82 +95,60 @@ from gt_commands import (
     PR_NUMBER_SUFFIX,
     PRInfo,
     BranchInfo,
+    prefetch_pr_info,
+    get_pr_info,
+    render_stack_comment_base,
+    mark_stack_comment,
 )
+import gt_commands
+
+
+def make_pr_info(specs: list[tuple[str, int, str, str]]) -> PRInfo:
+    """Build testuser/testrepo PR info from (branch, pr_number, base, title) tuples."""
+    return PRInfo(
+        owner="testuser",
+        repo="testrepo",
+        branches={
+            branch: BranchInfo(
+                url=f"https://github.com/testuser/testrepo/pull/{pr_number}",
+                base=base,
+                title=title,
+            )
+            for branch, pr_number, base, title in specs
+        },
+    )
 
 
 class TestStackComments(unittest.TestCase):
-    def setUp(self):
-        """Set up test fixtures"""
-        self.sample_pr_info = PRInfo(
-            owner="testuser",
-            repo="testrepo",
-            branches={
-                "feature_b": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/102",
-                    base="main",
-                    title="Add validation",
-                ),
-                "feature_c": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/103",
-                    base="feature_b",
-                    title="Update tests",
-                ),
-            },
-        )
+    @classmethod
+    def setUpClass(cls):
+        """Set up test fixtures once; tests that modify them work on a copy"""
+        cls.sample_pr_info = make_pr_info([
+            ("feature_b", 102, "main", "Add validation"),
+            ("feature_c", 103, "feature_b", "Update tests"),
+        ])
 
         # Create stack comment using actual format_stack_comment function
         # This represents a stack that previously had 3 branches but now only has 2 (feature_b, feature_c)
-        historical_pr_info = PRInfo(
-            owner="testuser",
-            repo="testrepo", 
-            branches={
-                "feature_a": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/101",
-                    base="main",
-                    title="Fix login bug",
-                ),
-                "feature_b": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/102",
-                    base="feature_a",
-                    title="Add validation",
-                ),
-                "feature_d": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/104",
-                    base="feature_b",
-                    title="Random other branch no longer in the stack",
-                ),
-            },
-        )
+        historical_pr_info = make_pr_info([
+            ("feature_a", 101, "main", "Fix login bug"),
+            ("feature_b", 102, "feature_a", "Add validation"),
+            ("feature_d", 104, "feature_b", "Random other branch no longer in the stack"),
+        ])
         
         # Generate the stack comment that would have been created before sync/restack
         # This simulates a comment that has historical branches
         full_historical_stack = ["feature_a", "feature_b", "feature_d"]
-        self.sample_stack_comment = format_stack_comment(full_historical_stack, historical_pr_info, "feature_b")
+        cls.sample_stack_comment = format_stack_comment(full_historical_stack, historical_pr_info, "feature_b")
 
         # Create a stack comment with current indicator 
-        current_stack_pr_info = PRInfo(
-            owner="testuser",
-            repo="testrepo",
-            branches={
-                "feature_a": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/101",
-                    base="main",
-                    title="Fix login bug",
-                ),
-                "feature_b": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/102",
-                    base="feature_a",
-                    title="Add validation",
-                ),
-                "feature_c": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/103",
-                    base="feature_b",
-                    title="Update tests",
-                ),
-            },
-        )
+        current_stack_pr_info = make_pr_info([
+            ("feature_a", 101, "main", "Fix login bug"),
+            ("feature_b", 102, "feature_a", "Add validation"),
+            ("feature_c", 103, "feature_b", "Update tests"),
+        ])
         current_stack = ["feature_a", "feature_b", "feature_c"]
-        self.sample_stack_comment_with_current = format_stack_comment(current_stack, current_stack_pr_info, "feature_b")
+        cls.sample_stack_comment_with_current = format_stack_comment(current_stack, current_stack_pr_info, "feature_b")
 
     def test_parse_historical_branches_from_comment_basic(self):
         """Test parsing historical branches from a basic stack comment"""
@@ -214,10 +203,26 @@ class TestStackComments(unittest.TestCase):
         self.assertEqual(len(historical_branches), 0)
         self.assertEqual(len(historical_pr_info), 0)
 
-    @patch("gt_commands.run_command")
-    def test_get_stack_comment_from_pr_found(self, mock_run_command):
+    def test_get_stack_comment_from_pr_found(self):
         """Test finding an existing stack comment from a PR"""
         # Create a properly formatted comment using format_stack_comment
+        test_pr_info = make_pr_info([
+            ("feature_a", 101, "main", "Test feature"),
+        ])
+        formatted_comment = format_stack_comment(["feature_a"], test_pr_info, "feature_a")
+
+        test_pr_info["branches"]["feature_a"]["comments"] = [
+            {"id": "comment_123", "body": formatted_comment},
+            {"id": "comment_456", "body": "Regular comment"},
+        ]
+
+        comment_id, comment_body = get_stack_comment_from_pr("feature_a", test_pr_info)
+
+        self.assertEqual(comment_id, "comment_123")
+        self.assertTrue(comment_body.startswith(STACK_COMMENT_PREFIX))
+
+    def test_get_stack_comment_from_pr_not_found(self):
+        """Test when no stack comment exists on a PR"""
         test_pr_info = PRInfo(
             owner="testuser",
             repo="testrepo",
@@ -226,90 +231,74 @@ class TestStackComments(unittest.TestCase):
                     url="https://github.com/testuser/testrepo/pull/101",
                     base="main",
                     title="Test feature",
+                    comments=[
+                        {"id": "comment_456", "body": "Regular comment"},
+                        {"id": "comment_789", "body": "Another comment"},
+                    ],
                 ),
             },
         )
-        formatted_comment = format_stack_comment(["feature_a"], test_pr_info, "feature_a")
-        escaped_comment = formatted_comment.replace('\n', '\\n')
-        
-        mock_run_command.return_value = f'{{"id": "comment_123", "body": "{escaped_comment}"}}\n{{"id": "comment_456", "body": "Regular comment"}}'
 
-        comment_id, comment_body = get_stack_comment_from_pr("feature_a")
-
-        self.assertEqual(comment_id, "comment_123")
-        self.assertTrue(comment_body.startswith(STACK_COMMENT_PREFIX))
-
-    @patch("gt_commands.run_command")
-    def test_get_stack_comment_from_pr_not_found(self, mock_run_command):
-        """Test when no stack comment exists on a PR"""
-        mock_run_command.return_value = """{"id": "comment_456", "body": "Regular comment"}
-{"id": "comment_789", "body": "Another comment"}"""
-
-        comment_id, comment_body = get_stack_comment_from_pr("feature_a")
+        comment_id, comment_body = get_stack_comment_from_pr("feature_a", test_pr_info)
 
         self.assertIsNone(comment_id)
         self.assertEqual(comment_body, "")
 
+        # PRs without fetched comments, or not in pr_info at all, have no stack comment
+        test_pr_info["branches"]["feature_a"].pop("comments")
+        self.assertEqual(get_stack_comment_from_pr("feature_a", test_pr_info), (None, ""))
+        self.assertEqual(get_stack_comment_from_pr("feature_z", test_pr_info), (None, ""))
+
+    def test_mark_stack_comment_matches_per_branch_format(self):
+        """Marking a shared render gives the same comment as formatting per branch"""
+        stack = ["feature_b", "feature_c", "feature_without_pr"]
+        lines, branch_to_line_index = render_stack_comment_base(stack, self.sample_pr_info)
+
+        for branch in stack:
+            expected_lines = ["### Stack\n", "main"] + [
+                _format_stack_line(
+                    i,
+                    len(stack),
+                    self.sample_pr_info["branches"][b]["title"] if b in self.sample_pr_info["branches"] else "PR pending",
+                    self.sample_pr_info["branches"][b]["url"].split("/")[-1] if b in self.sample_pr_info["branches"] else "N/A",
+                    b == branch,
+                )
+                for i, b in enumerate(stack)
+            ]
+            self.assertEqual(
+                mark_stack_comment(lines, branch_to_line_index, branch),
+                "\n".join(expected_lines),
+            )
+
+        # The shared render itself is left unmarked
+        self.assertNotIn(CURRENT_BRANCH_SUFFIX, "\n".join(lines))
+
     def test_format_stack_comment_basic(self):
         """Test basic stack comment formatting"""
         stack = ["feature_a", "feature_b", "feature_c"]
-        pr_info = PRInfo(
-            owner="testuser",
-            repo="testrepo",
-            branches={
-                "feature_a": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/101",
-                    base="main",
-                    title="Fix bug",
-                ),
-                "feature_b": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/102",
-                    base="feature_a",
-                    title="Add feature",
-                ),
-                "feature_c": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/103",
-                    base="feature_b",
-                    title="Add tests",
-                ),
-            },
-        )
+        pr_info = make_pr_info([
+            ("feature_a", 101, "main", "Fix bug"),
+            ("feature_b", 102, "feature_a", "Add feature"),
+            ("feature_c", 103, "feature_b", "Add tests"),
+        ])
 
         result = format_stack_comment(stack, pr_info, "feature_b")
 
         self.assertTrue(result.startswith(STACK_COMMENT_PREFIX))
-        self.assertIn("main", result)
-        self.assertIn("Fix bug (#101)", result)
-        self.assertIn(
-            "**Add feature (#102) ⬅️**", result
-        )  # Current branch should be bold
-        self.assertIn("Add tests (#103)", result)
+        # Current branch should be bold
+        expected = ("main", "Fix bug (#101)", "**Add feature (#102) ⬅️**", "Add tests (#103)")
+        missing = [part for part in expected if part not in result]
+        self.assertFalse(missing, f"Missing from stack comment: {missing}")
 
     def test_format_stack_comment_with_historical_branches(self):
         """Test formatting with historical branches included"""
         # Extended stack with historical branches
         stack = ["historical_100", "feature_a", "feature_b"]
-        pr_info = PRInfo(
-            owner="testuser",
-            repo="testrepo",
-            branches={
-                "historical_100": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/100",
-                    base="main",
-                    title="Old feature",
-                ),
-                "feature_a": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/101",
-                    base="historical_100",
-                    title="New feature",
-                ),
-                "feature_b": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/102",
-                    base="feature_a",
-                    title="Add tests",
-                ),
-            },
-        )
+        pr_info = make_pr_info([
+            ("historical_100", 100, "main", "Old feature"),
+            ("feature_a", 101, "historical_100", "New feature"),
+            ("feature_b", 102, "feature_a", "Add tests"),
+        ])
 
         result = format_stack_comment(stack, pr_info, "feature_a")
 
@@ -324,36 +313,21 @@ class TestStackComments(unittest.TestCase):
         self, mock_run_update_command, mock_get_pr_info, mock_run_command
     ):
         """Test the full add_stack_comments function with historical context"""
-        # Setup mocks
-        mock_get_pr_info.return_value = self.sample_pr_info
+        # Setup mocks (the comments added below must not leak into other tests)
+        pr_info = copy.deepcopy(self.sample_pr_info)
+        mock_get_pr_info.return_value = pr_info
 
         # Mock the comment retrieval for the lowest branch using format_stack_comment
-        # Create a historical stack comment that would exist on the PR
-        historical_comment_pr_info = PRInfo(
-            owner="testuser",
-            repo="testrepo",
-            branches={
-                "feature_a": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/101",
-                    base="main",
-                    title="Fix login bug",
-                ),
-                "feature_b": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/102",
-                    base="feature_a",
-                    title="Add validation",
-                ),
-                "feature_c": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/103",
-                    base="feature_b",
-                    title="Update tests",
-                ),
-            },
-        )
-        historical_stack = ["feature_a", "feature_b", "feature_c"]
+        # Create a historical stack comment that would exist on the PR, written
+        # before feature_c was stacked on top
+        historical_comment_pr_info = make_pr_info([
+            ("feature_a", 101, "main", "Fix login bug"),
+            ("feature_b", 102, "feature_a", "Add validation"),
+        ])
+        historical_stack = ["feature_a", "feature_b"]
         historical_comment = format_stack_comment(historical_stack, historical_comment_pr_info, "feature_b")
-        escaped_comment = historical_comment.replace('\n', '\\n').replace('"', '\\"')
-        mock_run_command.return_value = f'{{"id": "comment_123", "body": "{escaped_comment}"}}'
+        for branch_info in pr_info["branches"].values():
+            branch_info["comments"] = [{"id": "comment_123", "body": historical_comment}]
 
         # Test with a current stack that's missing the first branch (merged)
         current_stack = ["feature_b", "feature_c"]
@@ -367,11 +341,93 @@ class TestStackComments(unittest.TestCase):
         self.assertTrue(mock_run_update_command.called)
 
         # Verify the GraphQL call was made with the correct comment body
-        call_args = mock_run_update_command.call_args_list[0][0][0]
-        self.assertIn("graphql", call_args)
-        self.assertIn(
-            "Fix login bug (#101)", call_args
-        )  # Historical branch should be included
+        call = mock_run_update_command.call_args_list[0]
+        self.assertIn("graphql", call.args[0])
+        # Historical branch should be included, below the current stack
+        stack_comment = call.kwargs["stdin"]
+        self.assertEqual(
+            [entry for entry in map(_parse_stack_line, stack_comment.split("\n")) if entry],
+            [("101", "Fix login bug"), ("102", "Add validation"), ("103", "Update tests")],
+        )
+
+    @patch("gt_commands.get_pr_info")
+    @patch("gt_commands.run_update_command")
+    def test_add_stack_comments_reuses_given_pr_info(
+        self, mock_run_update_command, mock_get_pr_info
+    ):
+        """Test that add_stack_comments doesn't refetch PR info when it is passed in"""
+        with patch("gt_commands.get_trunk_branch", return_value="main"):
+            add_stack_comments(
+                ["feature_b", "feature_c"],
+                dry_run=True,
+                submitted_branches=["feature_c"],
+                pr_info=self.sample_pr_info,
+            )
+
+        mock_get_pr_info.assert_not_called()
+        self.assertEqual(mock_run_update_command.call_count, 2)
+
+    @patch("gt_commands.run_update_command")
+    def test_add_stack_comments_batches_existing_comments(self, mock_run_update_command):
+        """Test that existing stack comments are all edited with a single mutation"""
+        pr_info = copy.deepcopy(self.sample_pr_info)
+        pr_info["branches"]["feature_b"]["comments"] = [{"id": "IC_b", "body": STACK_COMMENT_PREFIX}]
+        pr_info["branches"]["feature_c"]["comments"] = [{"id": "IC_c", "body": STACK_COMMENT_PREFIX}]
+
+        with patch("gt_commands.get_trunk_branch", return_value="main"):
+            results = add_stack_comments(
+                ["feature_b", "feature_c"],
+                dry_run=True,
+                submitted_branches=["feature_c"],
+                pr_info=pr_info,
+            )
+
+        self.assertEqual(results, [("feature_c", True, ""), ("feature_b", True, "")])
+        mock_run_update_command.assert_called_once()
+        call = mock_run_update_command.call_args
+        self.assertEqual(call.args[0], ["gh", "api", "graphql", "--input", "-"])
+
+        request = json.loads(call.kwargs["stdin"])
+        self.assertIn("c0: updateIssueComment", request["query"])
+        self.assertIn("c1: updateIssueComment", request["query"])
+        variables = request["variables"]
+        self.assertEqual((variables["id0"], variables["id1"]), ("IC_c", "IC_b"))
+        self.assertIn("**Update tests (#103) ⬅️**", variables["body0"])
+        self.assertIn("**Add validation (#102) ⬅️**", variables["body1"])
+
+    @patch("gt_commands.run_update_command")
+    def test_add_stack_comments_skips_unchanged_comments(self, mock_run_update_command):
+        """Test that a stack comment that already reads the same is not rewritten"""
+        pr_info = copy.deepcopy(self.sample_pr_info)
+        with patch("gt_commands.get_trunk_branch", return_value="main"):
+            for branch in ("feature_b", "feature_c"):
+                current_comment = format_stack_comment(["feature_b", "feature_c"], pr_info, branch)
+                pr_info["branches"][branch]["comments"] = [{"id": f"IC_{branch}", "body": current_comment}]
+
+            results = add_stack_comments(
+                ["feature_b", "feature_c"],
+                dry_run=True,
+                submitted_branches=["feature_c"],
+                pr_info=pr_info,
+            )
+
+        self.assertEqual(results, [("feature_c", True, ""), ("feature_b", True, "")])
+        mock_run_update_command.assert_not_called()
+
+    @patch("gt_commands.run_update_command")
+    def test_add_stack_comments_results_keep_update_order(self, mock_run_update_command):
+        """Test that parallel comment updates are reported in a stable order"""
+        with patch("gt_commands.get_trunk_branch", return_value="main"):
+            results = add_stack_comments(
+                ["feature_b", "feature_c"],
+                dry_run=True,
+                submitted_branches=["feature_c"],
+                pr_info=self.sample_pr_info,
+            )
+
+        self.assertEqual(
+            results, [("feature_c", True, ""), ("feature_b", True, "")]
+        )
 
     @patch("gt_commands.run_command")
     @patch("gt_commands.get_pr_info")
@@ -380,44 +436,21 @@ class TestStackComments(unittest.TestCase):
     ):
         """Test single branch stack that has historical context"""
         # Setup mocks
-        mock_get_pr_info.return_value = PRInfo(
-            owner="testuser",
-            repo="testrepo",
-            branches={
-                "feature_c": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/103",
-                    base="main",
-                    title="Update tests",
-                ),
-            },
-        )
+        mock_get_pr_info.return_value = make_pr_info([
+            ("feature_c", 103, "main", "Update tests"),
+        ])
 
         # Mock comment with historical context using format_stack_comment
-        historical_pr_info_full = PRInfo(
-            owner="testuser",
-            repo="testrepo",
-            branches={
-                "feature_a": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/101",
-                    base="main",
-                    title="Fix login bug",
-                ),
-                "feature_b": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/102",
-                    base="feature_a",
-                    title="Add validation",
-                ),
-                "feature_c": BranchInfo(
-                    url="https://github.com/testuser/testrepo/pull/103",
-                    base="feature_b",
-                    title="Update tests",
-                ),
-            },
-        )
+        historical_pr_info_full = make_pr_info([
+            ("feature_a", 101, "main", "Fix login bug"),
+            ("feature_b", 102, "feature_a", "Add validation"),
+            ("feature_c", 103, "feature_b", "WIP tests"),
+        ])
         historical_stack_full = ["feature_a", "feature_b", "feature_c"]
         historical_comment_full = format_stack_comment(historical_stack_full, historical_pr_info_full, "feature_c")
-        escaped_comment_full = historical_comment_full.replace('\n', '\\n').replace('"', '\\"')
-        mock_run_command.return_value = f'{{"id": "comment_123", "body": "{escaped_comment_full}"}}'
+        mock_get_pr_info.return_value["branches"]["feature_c"]["comments"] = [
+            {"id": "comment_123", "body": historical_comment_full}
+        ]
 
         # Test with single branch stack
         current_stack = ["feature_c"]
@@ -428,18 +461,14 @@ class TestStackComments(unittest.TestCase):
                 current_stack, dry_run=True, submitted_branches=submitted_branches
             )
 
-            # Should still update the comment to preserve history
+            # The PR was retitled since, so the comment is rewritten with its history
             self.assertTrue(mock_run_update_command.called)
 
             # assert that the comment was updated to include the historical context
-            self.assertIn(
-                "Fix login bug (#101)", mock_run_update_command.call_args[0][0]
-            )
-            self.assertIn(
-                "Add validation (#102)", mock_run_update_command.call_args[0][0]
-            )
-            self.assertIn(
-                "Update tests (#103)", mock_run_update_command.call_args[0][0]
+            stack_comment = mock_run_update_command.call_args.kwargs["stdin"]
+            self.assertEqual(
+                [entry for entry in map(_parse_stack_line, stack_comment.split("\n")) if entry],
+                [("101", "Fix login bug"), ("102", "Add validation"), ("103", "Update tests")],
             )
 
     def test_edge_cases(self):
@@ -597,6 +626,7 @@ class TestStackComments(unittest.TestCase):
             "├ Title ()",  # Empty PR number
             "├ Title (#123",  # Missing closing parenthesis
             "├ Title 123)",  # Missing opening parenthesis  
+            "├ Title (#123) trailing text",  # PR number must end the entry
             "random text",  # No structure at all
             "├",  # Just tree character
             "├─",  # Tree character with dash but no content
@@ -620,6 +650,8 @@ class TestStackComments(unittest.TestCase):
             ("├ Title with (parentheses) inside (#222)", "222", "Title with (parentheses) inside"),
             ("├ Title with #hashtag (#333)", "333", "Title with #hashtag"),
             ("├ Multi-line\ntitle (#444)", "444", "Multi-line\ntitle"),
+            ("├ Revert \"Add cache (#12)\" (#345)", "345", "Revert \"Add cache (#12)\""),
+            ("├ **Squashed (#1) (#2) ⬅️**", "2", "Squashed (#1)"),
             
             # Different tree characters and indentation
             ("└ Last item (#555)", "555", "Last item"),
@@ -761,6 +793,97 @@ class TestStackComments(unittest.TestCase):
         self.assertEqual(parsed, ("123", "Test"))
 
 
+class TestPrPrefetch(unittest.TestCase):
+    """Test the GraphQL prefetch cache used by submit"""
+
+    def setUp(self):
+        gt_commands._PR_CACHE.clear()
+        gt_commands._PR_CACHE_REPO = None
+
+    def tearDown(self):
+        gt_commands._PR_CACHE.clear()
+        gt_commands._PR_CACHE_REPO = None
+
+    @patch("gt_commands.run_command")
+    def test_prefetch_serves_pr_info_and_comments_from_cache(self, mock_run_command):
+        """A single GraphQL call should answer later PR and comment lookups"""
+        stack_body = f"{STACK_COMMENT_PREFIX}main\n└ **Add validation (#102) ⬅️**"
+        mock_run_command.return_value = json.dumps({
+            "data": {
+                "repository": {
+                    "owner": {"login": "testuser"},
+                    "name": "testrepo",
+                    "b0": {"nodes": [{
+                        "headRefName": "feature_b",
+                        "url": "https://github.com/testuser/testrepo/pull/102",
+                        "baseRefName": "main",
+                        "title": "Add validation",
+                        "comments": {"nodes": [
+                            {"id": "comment_1", "body": "LGTM"},
+                            {"id": "comment_2", "body": stack_body},
+                        ]},
+                    }]},
+                    "b1": {"nodes": []},
+                }
+            }
+        })
+
+        prefetch_pr_info(["feature_b", "feature_c"])
+        self.assertEqual(mock_run_command.call_count, 1)
+        self.assertEqual(mock_run_command.call_args.args[0][:3], ["gh", "api", "graphql"])
+
+        pr_info = get_pr_info()
+        self.assertEqual(pr_info["owner"], "testuser")
+        self.assertEqual(pr_info["repo"], "testrepo")
+        self.assertEqual(list(pr_info["branches"]), ["feature_b"])
+        self.assertEqual(pr_info["branches"]["feature_b"]["base"], "main")
+
+        comment_id, comment_body = get_stack_comment_from_pr("feature_b", pr_info)
+        self.assertEqual(comment_id, "comment_2")
+        self.assertEqual(comment_body, stack_body)
+
+        # No further gh calls were needed
+        self.assertEqual(mock_run_command.call_count, 1)
+
+    @patch("gt_commands._gh_cache_enabled", False)
+    @patch("gt_commands.run_command")
+    def test_get_pr_info_without_prefetch_uses_one_query(self, mock_run_command):
+        """Open PRs and the repo owner/name should come back from a single GraphQL call"""
+        mock_run_command.return_value = json.dumps({
+            "data": {
+                "repository": {
+                    "owner": {"login": "testuser"},
+                    "name": "testrepo",
+                    "pullRequests": {"nodes": [{
+                        "headRefName": "feature_b",
+                        "url": "https://github.com/testuser/testrepo/pull/102",
+                        "baseRefName": "main",
+                        "title": "Add validation",
+                        "comments": {"nodes": [{"id": "comment_1", "body": "LGTM"}]},
+                    }]},
+                }
+            }
+        })
+
+        pr_info = get_pr_info()
+
+        mock_run_command.assert_called_once()
+        self.assertEqual(mock_run_command.call_args.args[0][:3], ["gh", "api", "graphql"])
+        self.assertEqual(pr_info["owner"], "testuser")
+        self.assertEqual(pr_info["repo"], "testrepo")
+        self.assertEqual(
+            pr_info["branches"],
+            {
+                "feature_b": {
+                    "url": "https://github.com/testuser/testrepo/pull/102",
+                    "base": "main",
+                    "title": "Add validation",
+                    "comments": [{"id": "comment_1", "body": "LGTM"}],
+                }
+            },
+        )
+
+
 if __name__ == "__main__":
     # Run the tests
     unittest.main(verbosity=2)
@@ -4,205 +4,207 @@ Test suite for sync command functionality in gt_commands.py
 """
 
 import unittest
-from unittest.mock import patch
+from contextlib import redirect_stdout
+from unittest.mock import DEFAULT, Mock, call, patch
+import io
+import json
 import sys
 import os
+import subprocess
+import tempfile
+import time
 
 # Add the bin directory to the path so we can import gt_commands
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
 
-from gt_commands import sync_command, get_local_branches, get_closed_pr_branches, delete_branch, parse_stack
+from gt_commands import (
+    sync_command,
+    get_local_branches,
+    get_closed_pr_branches,
+    delete_branch,
+    delete_branches,
+    gt_delete_accepts_multiple_branches,
+    parse_stack,
+    run_cached_command,
+    clear_gh_cache,
+    get_current_branch,
+    get_local_branch_tips,
+    is_ancestor,
+    main,
+)
 
 
 class TestParseStack(unittest.TestCase):
     """Test cases for the parse_stack function"""
 
-    @patch('gt_commands.run_command')
-    def test_parse_stack_with_needs_restack_message(self, mock_run_command):
-        """Test parse_stack handles '(needs restack)' messages correctly"""
-        # Simulate gt ls --stack --reverse output with "(needs restack)" messages
-        mock_output = """◯ main
+    # (description, gt ls --stack --reverse output, expected branches)
+    CASES = [
+        (
+            "'(needs restack)' suffixes are ignored",
+            """◯ main
 ◯ feature_a (needs restack)
 ◯ feature.b
-◯ feature_c (needs restack)"""
-        
-        mock_run_command.return_value = mock_output
-        
-        result = parse_stack()
-        
-        # Should extract branch names correctly, ignoring "(needs restack)" text
-        expected = ["feature_a", "feature.b", "feature_c"]
-        self.assertEqual(result, expected)
-
-    @patch('gt_commands.run_command')
-    def test_parse_stack_with_newline_split_suffix(self, mock_run_command):
-        """Handles case where '(needs restack)' renders on its own wrapped line"""
-        # Some terminals/wrapping can split the suffix to next line; ensure parser ignores extra line
-        mock_output = """◯ main
+◯ feature_c (needs restack)""",
+            ["feature_a", "feature.b", "feature_c"],
+        ),
+        (
+            # Some terminals/wrapping can split the suffix to next line; ensure parser ignores extra line
+            "'(needs restack)' wrapped onto its own line",
+            """◯ main
 ◯ user/feature-branch-1
   (needs restack)
 ◯ fix_critical_bug
 ◯ feature/new-ui-component
-  (needs restack)"""
-
-        mock_run_command.return_value = mock_output
-
-        result = parse_stack()
-
-        expected = ["user/feature-branch-1", "fix_critical_bug", "feature/new-ui-component"]
-        self.assertEqual(result, expected)
-
-    @patch('gt_commands.run_command')
-    def test_parse_stack_normal_output(self, mock_run_command):
-        """Test parse_stack works normally without restack messages"""
-        mock_output = """◯ main
+  (needs restack)""",
+            ["user/feature-branch-1", "fix_critical_bug", "feature/new-ui-component"],
+        ),
+        (
+            "normal output without restack messages",
+            """◯ main
 ◯ feature_a
 ◯ feature_b
-◯ feature_c"""
-        
-        mock_run_command.return_value = mock_output
-        
-        result = parse_stack()
-        
-        expected = ["feature_a", "feature_b", "feature_c"]
-        self.assertEqual(result, expected)
-
-    @patch('gt_commands.run_command')
-    def test_parse_stack_mixed_messages(self, mock_run_command):
-        """Test parse_stack with some branches having restack messages and others not"""
-        mock_output = """◯ main
+◯ feature_c""",
+            ["feature_a", "feature_b", "feature_c"],
+        ),
+        (
+            "some branches with restack messages and others without",
+            """◯ main
 ◯ feature_a
 ◯ feature_b (needs restack)
 ◯ feature_c
-◯ feature_d (needs restack)"""
-        
-        mock_run_command.return_value = mock_output
-        
-        result = parse_stack()
-        
-        expected = ["feature_a", "feature_b", "feature_c", "feature_d"]
-        self.assertEqual(result, expected)
-
-    @patch('gt_commands.run_command')
-    def test_parse_stack_with_complex_branch_names(self, mock_run_command):
-        """Test parse_stack with complex branch names and restack messages"""
-        mock_output = """◯ main
+◯ feature_d (needs restack)""",
+            ["feature_a", "feature_b", "feature_c", "feature_d"],
+        ),
+        (
+            "complex branch names with restack messages",
+            """◯ main
 ◯ user/feature-branch-1 (needs restack)
 ◯ fix_critical_bug
-◯ feature/new-ui-component (needs restack)"""
-        
-        mock_run_command.return_value = mock_output
-        
-        result = parse_stack()
-        
-        expected = ["user/feature-branch-1", "fix_critical_bug", "feature/new-ui-component"]
-        self.assertEqual(result, expected)
+◯ feature/new-ui-component (needs restack)""",
+            ["user/feature-branch-1", "fix_critical_bug", "feature/new-ui-component"],
+        ),
+        (
+            "real output with the current branch marker",
+            """◯  main
+◉  clay/09-03-feat_add_admin_ui_for_zdr (needs restack)""",
+            ["clay/09-03-feat_add_admin_ui_for_zdr"],
+        ),
+    ]
 
-        
+    @patch('gt_commands.get_trunk_branch', return_value="main")
     @patch('gt_commands.run_command')
-    def test_parse_stack_with_needs_restack_message_real(self, mock_run_command):
-        """Test parse_stack with needs restack message real"""
-        mock_output = """◯  main
-◉  clay/09-03-feat_add_admin_ui_for_zdr (needs restack)"""
-        
-        mock_run_command.return_value = mock_output
-        
-        result = parse_stack()
-        
-        expected = ["clay/09-03-feat_add_admin_ui_for_zdr"]
-        self.assertEqual(result, expected)
+    def test_parse_stack(self, mock_run_command, mock_get_trunk_branch):
+        """Test parse_stack extracts the branch names from each sample gt output"""
+        for description, mock_output, expected in self.CASES:
+            with self.subTest(description):
+                mock_run_command.return_value = mock_output
+                self.assertEqual(parse_stack(), expected)
 
 
 class TestSyncCommand(unittest.TestCase):
     """Test the sync_command function"""
 
-    def setUp(self):
-        """Set up common test fixtures"""
-        self.sample_local_branches = {"feature_a", "feature_b", "feature_c", "old_feature"}
-        self.sample_closed_pr_branches = {"feature_a", "old_feature"}
-        self.sample_stack = ["feature_b", "feature_c"]
+    # run_command output for each git call of a sync with no local changes
+    CLEAN_SYNC_GIT_OUTPUT = (
+        "",  # git status --porcelain (no local changes)
+        "",  # git checkout main
+        "",  # git pull
+        "",  # git checkout original_branch
+    )
+    # Same, for --current-stack, which restacks from the top of the stack
+    CLEAN_STACK_SYNC_GIT_OUTPUT = (
+        "",  # git status --porcelain (no local changes)
+        "",  # git checkout main
+        "",  # git pull
+        "",  # git checkout top of stack (targeted restack)
+        "",  # git checkout original_branch
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up read-only test fixtures once for the class"""
+        cls.sample_local_branches = frozenset({"feature_a", "feature_b", "feature_c", "old_feature"})
+        cls.sample_closed_pr_branches = frozenset({"feature_a", "old_feature"})
+        cls.sample_stack = ("feature_b", "feature_c")
 
-    @patch('gt_commands.run_command')
-    @patch('gt_commands.run_update_command')
-    @patch('gt_commands.get_current_branch')
-    @patch('gt_commands.get_local_branches')
-    @patch('gt_commands.get_closed_pr_branches')
-    @patch('builtins.input')
-    def test_sync_command_basic_functionality(self, mock_input, mock_get_closed_prs, 
-                                            mock_get_local_branches, mock_get_current_branch,
-                                            mock_run_update_command, mock_run_command):
+    def setUp(self):
+        # Every sync test stubs out git, gt and gh; each test sets only the responses it needs
+        patcher = patch.multiple(
+            'gt_commands',
+            get_trunk_branch=DEFAULT,
+            run_command=DEFAULT,
+            run_update_command=DEFAULT,
+            get_current_branch=DEFAULT,
+            get_local_branches=DEFAULT,
+            get_closed_pr_branches=DEFAULT,
+            parse_stack=DEFAULT,
+        )
+        mocks = patcher.start()
+        self.addCleanup(patcher.stop)
+        mocks['get_trunk_branch'].return_value = "main"
+        self.mock_run_command = mocks['run_command']
+        self.mock_run_update_command = mocks['run_update_command']
+        self.mock_get_current_branch = mocks['get_current_branch']
+        self.mock_get_local_branches = mocks['get_local_branches']
+        self.mock_get_closed_prs = mocks['get_closed_pr_branches']
+        self.mock_parse_stack = mocks['parse_stack']
+
+        input_patcher = patch('builtins.input')
+        self.mock_input = input_patcher.start()
+        self.addCleanup(input_patcher.stop)
+
+    def test_sync_command_basic_functionality(self):
         """Test basic sync functionality without current_stack flag"""
         # Setup mocks
-        mock_run_command.side_effect = [
-            "",  # git status --porcelain (no local changes)
-            "",  # git checkout main
-            "",  # git pull
-            "",  # git checkout original_branch
-        ]
-        mock_get_current_branch.return_value = "feature_b"
-        mock_get_local_branches.return_value = self.sample_local_branches
-        mock_get_closed_prs.return_value = self.sample_closed_pr_branches
-        mock_input.side_effect = ["y", "n"]  # Delete feature_a, keep old_feature
+        self.mock_run_command.side_effect = self.CLEAN_SYNC_GIT_OUTPUT
+        self.mock_get_current_branch.return_value = "feature_b"
+        self.mock_get_local_branches.return_value = self.sample_local_branches
+        self.mock_get_closed_prs.return_value = self.sample_closed_pr_branches
+        self.mock_input.side_effect = ["y", "n"]  # Delete feature_a, keep old_feature
 
         # Run sync command
         sync_command(dry_run=False, skip_restack=False, current_stack=False)
 
         # Verify expected calls
-        mock_get_local_branches.assert_called_once()
-        mock_get_closed_prs.assert_called_once()
+        self.mock_get_local_branches.assert_called_once()
+        self.mock_get_closed_prs.assert_called_once()
         
         # Verify git operations
-        expected_git_calls = [
-            "git status --porcelain",
-            "git checkout main", 
-            "git pull",
-            "git checkout feature_b"
-        ]
-        actual_git_calls = [call[0][0] for call in mock_run_command.call_args_list if not call[0][0].startswith('gt')]
-        for expected_call in expected_git_calls:
-            self.assertIn(expected_call, actual_git_calls)
-
-    @patch('gt_commands.run_command')
-    @patch('gt_commands.run_update_command')
-    @patch('gt_commands.get_current_branch')
-    @patch('gt_commands.parse_stack')
-    @patch('gt_commands.get_closed_pr_branches')
-    @patch('builtins.input')
-    def test_sync_command_current_stack_functionality(self, mock_input, mock_get_closed_prs,
-                                                     mock_parse_stack, mock_get_current_branch,
-                                                     mock_run_update_command, mock_run_command):
+        self.mock_run_command.assert_has_calls([
+            call(["git", "status", "--porcelain"]),
+            call(["git", "checkout", "main"]),
+            call(["git", "pull"]),
+            call(["git", "checkout", "feature_b"]),
+        ], any_order=True)
+
+    def test_sync_command_current_stack_functionality(self):
         """Test sync functionality with current_stack=True"""
         # Setup mocks
-        mock_run_command.side_effect = [
-            "",  # git status --porcelain (no local changes)
-            "",  # git checkout main
-            "",  # git pull
-            "",  # git checkout original_branch
-        ]
-        mock_get_current_branch.return_value = "feature_b"
-        mock_parse_stack.return_value = self.sample_stack
-        mock_get_closed_prs.return_value = self.sample_closed_pr_branches
-        mock_input.return_value = "n"  # Don't delete any branches
+        self.mock_run_command.side_effect = self.CLEAN_STACK_SYNC_GIT_OUTPUT
+        self.mock_get_local_branches.return_value = {"feature_a", "feature_b", "feature_c"}
+        self.mock_get_current_branch.return_value = "feature_b"
+        self.mock_parse_stack.return_value = self.sample_stack
+        self.mock_get_closed_prs.return_value = self.sample_closed_pr_branches
+        self.mock_input.return_value = "n"  # Don't delete any branches
 
         # Run sync command with current_stack=True
         sync_command(dry_run=False, skip_restack=False, current_stack=True)
 
         # Verify stack was parsed instead of getting all local branches
-        mock_parse_stack.assert_called_once()
+        self.mock_parse_stack.assert_called_once()
         
         # Verify closed PR branches were still fetched
-        mock_get_closed_prs.assert_called_once()
+        self.mock_get_closed_prs.assert_called_once()
 
-    @patch('gt_commands.run_command')
-    @patch('gt_commands.get_current_branch')
-    def test_sync_command_current_stack_from_main_branch_error(self, mock_get_current_branch, mock_run_command):
+    def test_sync_command_current_stack_from_main_branch_error(self):
         """Test that sync with current_stack=True fails when on main branch"""
         # Setup mocks
-        mock_run_command.return_value = ""  # git status --porcelain (no local changes)
-        mock_get_current_branch.return_value = "main"
+        self.mock_run_command.return_value = ""  # git status --porcelain (no local changes)
+        self.mock_get_local_branches.return_value = {"feature_a"}
+        self.mock_get_current_branch.return_value = "main"
 
         # Run sync command with current_stack=True from main - should exit
-        with patch('builtins.print') as mock_print:
+        with redirect_stdout(io.StringIO()) as stdout:
             with self.assertRaises(SystemExit) as cm:
                 sync_command(dry_run=False, skip_restack=False, current_stack=True)
 
@@ -210,28 +212,18 @@ class TestSyncCommand(unittest.TestCase):
         self.assertEqual(cm.exception.code, 1)
         
         # Verify error message was printed
-        mock_print.assert_called()
-        print_calls = [call.args[0] for call in mock_print.call_args_list]
-        error_found = any("Cannot sync current stack from main branch" in call for call in print_calls)
-        self.assertTrue(error_found)
+        self.assertIn("Cannot sync current stack from trunk branch", stdout.getvalue())
 
-    @patch('gt_commands.run_command')
-    @patch('gt_commands.run_update_command')
-    @patch('gt_commands.get_current_branch')
-    @patch('gt_commands.parse_stack')
-    @patch('gt_commands.get_closed_pr_branches')
-    @patch('builtins.input')
-    def test_sync_command_current_stack_parse_error(self, mock_input, mock_get_closed_prs,
-                                                   mock_parse_stack, mock_get_current_branch,
-                                                   mock_run_update_command, mock_run_command):
+    def test_sync_command_current_stack_parse_error(self):
         """Test sync handling when parse_stack raises an exception"""
         # Setup mocks
-        mock_run_command.return_value = ""  # git status --porcelain (no local changes)
-        mock_get_current_branch.return_value = "feature_b"
-        mock_parse_stack.side_effect = Exception("Failed to parse stack")
+        self.mock_run_command.return_value = ""  # git status --porcelain (no local changes)
+        self.mock_get_local_branches.return_value = {"feature_a", "feature_b", "feature_c"}
+        self.mock_get_current_branch.return_value = "feature_b"
+        self.mock_parse_stack.side_effect = Exception("Failed to parse stack")
 
         # Run sync command with current_stack=True when parse fails
-        with patch('builtins.print') as mock_print:
+        with redirect_stdout(io.StringIO()) as stdout:
             with self.assertRaises(SystemExit) as cm:
                 sync_command(dry_run=False, skip_restack=False, current_stack=True)
 
@@ -239,113 +231,67 @@ class TestSyncCommand(unittest.TestCase):
         self.assertEqual(cm.exception.code, 1)
         
         # Verify error message was printed
-        mock_print.assert_called()
-        print_calls = [call.args[0] for call in mock_print.call_args_list]
-        error_found = any("Error parsing stack" in call for call in print_calls)
-        self.assertTrue(error_found)
+        self.assertIn("Error parsing stack", stdout.getvalue())
 
-    @patch('gt_commands.run_command')
-    @patch('gt_commands.run_update_command')
-    @patch('gt_commands.get_current_branch')
-    @patch('gt_commands.parse_stack')
-    @patch('gt_commands.get_closed_pr_branches')
-    @patch('builtins.input')
-    def test_sync_command_current_stack_no_merged_branches(self, mock_input, mock_get_closed_prs,
-                                                          mock_parse_stack, mock_get_current_branch,
-                                                          mock_run_update_command, mock_run_command):
+    def test_sync_command_current_stack_no_merged_branches(self):
         """Test sync with current_stack when no branches need deletion"""
         # Setup mocks
-        mock_run_command.side_effect = [
-            "",  # git status --porcelain (no local changes)
-            "",  # git checkout main
-            "",  # git pull
-            "",  # git checkout original_branch
-        ]
-        mock_get_current_branch.return_value = "feature_b"
-        mock_parse_stack.return_value = ["feature_b", "feature_c"]
-        mock_get_closed_prs.return_value = {"some_other_branch"}  # No overlap
+        self.mock_run_command.side_effect = self.CLEAN_STACK_SYNC_GIT_OUTPUT
+        self.mock_get_local_branches.return_value = {"feature_a", "feature_b", "feature_c"}
+        self.mock_get_current_branch.return_value = "feature_b"
+        self.mock_parse_stack.return_value = ["feature_b", "feature_c"]
+        self.mock_get_closed_prs.return_value = {"some_other_branch"}  # No overlap
 
         # Run sync command
-        with patch('builtins.print') as mock_print:
+        with redirect_stdout(io.StringIO()) as stdout:
             sync_command(dry_run=False, skip_restack=False, current_stack=True)
 
         # Verify no deletion prompts
-        mock_input.assert_not_called()
+        self.mock_input.assert_not_called()
         
         # Verify success message mentions "stack"
-        print_calls = [call.args[0] for call in mock_print.call_args_list]
-        success_found = any("No merged stack branches to clean up" in call for call in print_calls)
-        self.assertTrue(success_found)
+        self.assertIn("No merged stack branches to clean up", stdout.getvalue())
 
-    @patch('gt_commands.run_command')
-    @patch('gt_commands.run_update_command')  
-    @patch('gt_commands.get_current_branch')
-    @patch('gt_commands.parse_stack')
-    @patch('gt_commands.get_closed_pr_branches')
-    @patch('builtins.input')
-    def test_sync_command_current_stack_with_merged_branches(self, mock_input, mock_get_closed_prs,
-                                                            mock_parse_stack, mock_get_current_branch,
-                                                            mock_run_update_command, mock_run_command):
+    def test_sync_command_current_stack_with_merged_branches(self):
         """Test sync with current_stack when stack branches need deletion"""
         # Setup mocks
-        mock_run_command.side_effect = [
-            "",  # git status --porcelain (no local changes)
-            "",  # git checkout main
-            "",  # git pull 
-            "",  # git checkout original_branch
-        ]
-        mock_get_current_branch.return_value = "feature_c"
-        mock_parse_stack.return_value = ["feature_a", "feature_b", "feature_c"]
-        mock_get_closed_prs.return_value = {"feature_a"}  # feature_a is merged
-        mock_input.return_value = "y"  # Delete the merged branch
+        self.mock_run_command.side_effect = self.CLEAN_STACK_SYNC_GIT_OUTPUT
+        self.mock_get_local_branches.return_value = {"feature_a", "feature_b", "feature_c"}
+        self.mock_get_current_branch.return_value = "feature_c"
+        self.mock_parse_stack.return_value = ["feature_a", "feature_b", "feature_c"]
+        self.mock_get_closed_prs.return_value = {"feature_a"}  # feature_a is merged
+        self.mock_input.return_value = "y"  # Delete the merged branch
 
         # Run sync command
-        with patch('builtins.print') as mock_print:
+        with redirect_stdout(io.StringIO()) as stdout:
             sync_command(dry_run=True, skip_restack=False, current_stack=True)
 
         # Verify deletion was prompted
-        mock_input.assert_called_once()
+        self.mock_input.assert_called_once()
         
         # Verify messages mention "stack"
-        print_calls = [call.args[0] for call in mock_print.call_args_list]
-        stack_context_found = any("stack" in call.lower() for call in print_calls)
-        self.assertTrue(stack_context_found)
+        self.assertIn("stack", stdout.getvalue().lower())
 
-    @patch('gt_commands.get_trunk_branch', return_value="main")
     @patch('gt_commands.delete_branch')
-    @patch('gt_commands.run_command')
-    @patch('gt_commands.run_update_command')
-    @patch('gt_commands.get_current_branch')
-    @patch('gt_commands.get_local_branches')
-    @patch('gt_commands.get_closed_pr_branches')
-    @patch('builtins.input')
-    def test_sync_command_yes_auto_deletes(self, mock_input, mock_get_closed_prs, mock_get_local_branches,
-                                           mock_get_current_branch, mock_run_update_command, mock_run_command,
-                                           mock_delete_branch, mock_get_trunk_branch):
+    def test_sync_command_yes_auto_deletes(self, mock_delete_branch):
         """Test sync auto-deletes merged branches when --yes flag is used"""
-        mock_run_command.side_effect = [
-            "",  # git status --porcelain (no local changes)
-            "",  # git checkout main
-            "",  # git pull
-            "",  # git checkout original_branch
-        ]
-        mock_get_current_branch.return_value = "feature_b"
-        mock_get_local_branches.return_value = {"feature_a", "feature_b"}
-        mock_get_closed_prs.return_value = {"feature_a"}  # feature_a is merged
+        self.mock_run_command.side_effect = self.CLEAN_SYNC_GIT_OUTPUT
+        self.mock_get_current_branch.return_value = "feature_b"
+        self.mock_get_local_branches.return_value = {"feature_a", "feature_b"}
+        self.mock_get_closed_prs.return_value = {"feature_a"}  # feature_a is merged
 
         sync_command(dry_run=False, skip_restack=False, current_stack=False, assume_yes=True)
 
-        mock_input.assert_not_called()
+        self.mock_input.assert_not_called()
         mock_delete_branch.assert_called_once_with("feature_a", False)
 
-    @patch('gt_commands.run_command')
-    def test_sync_command_local_changes_error(self, mock_run_command):
+    def test_sync_command_local_changes_error(self):
         """Test that sync exits when there are local changes"""
         # Setup mock to return local changes
-        mock_run_command.return_value = "M some_file.txt"  # git status shows changes
+        self.mock_run_command.return_value = "M some_file.txt"  # git status shows changes
 
         # Run sync command - should exit
-        with patch('builtins.print') as mock_print:
+        with redirect_stdout(io.StringIO()) as stdout:
             with self.assertRaises(SystemExit) as cm:
                 sync_command(dry_run=False, skip_restack=False, current_stack=False)
 
@@ -353,179 +299,68 @@ class TestSyncCommand(unittest.TestCase):
         self.assertEqual(cm.exception.code, 1)
         
         # Verify error message was printed
-        mock_print.assert_called()
-        print_calls = [call.args[0] for call in mock_print.call_args_list]
-        error_found = any("local changes" in call for call in print_calls)
-        self.assertTrue(error_found)
+        self.assertIn("local changes", stdout.getvalue())
 
-    @patch('gt_commands.run_command')
-    @patch('gt_commands.run_update_command')
-    @patch('gt_commands.get_current_branch')
-    @patch('gt_commands.get_local_branches')
-    @patch('gt_commands.get_closed_pr_branches')
-    def test_sync_command_skip_restack(self, mock_get_closed_prs, mock_get_local_branches,
-                                      mock_get_current_branch, mock_run_update_command, mock_run_command):
+    def test_sync_command_skip_restack(self):
         """Test sync with skip_restack=True"""
         # Setup mocks
-        mock_run_command.side_effect = [
-            "",  # git status --porcelain (no local changes)
-            "",  # git checkout main
-            "",  # git pull
-            "",  # git checkout original_branch
-        ]
-        mock_get_current_branch.return_value = "feature_b"
-        mock_get_local_branches.return_value = {"feature_b"}
-        mock_get_closed_prs.return_value = set()  # No merged branches
+        self.mock_run_command.side_effect = self.CLEAN_SYNC_GIT_OUTPUT
+        self.mock_get_current_branch.return_value = "feature_b"
+        self.mock_get_local_branches.return_value = {"feature_b"}
+        self.mock_get_closed_prs.return_value = set()  # No merged branches
 
         # Run sync command with skip_restack=True
-        with patch('builtins.print') as mock_print:
+        with redirect_stdout(io.StringIO()) as stdout:
             sync_command(dry_run=False, skip_restack=True, current_stack=False)
 
         # Verify restack was not called
-        restack_calls = [call for call in mock_run_update_command.call_args_list 
-                        if 'restack' in call[0][0]]
+        restack_calls = [call for call in self.mock_run_update_command.call_args_list 
+                        if 'restack' in call.args[0]]
         self.assertEqual(len(restack_calls), 0)
         
         # Verify skip message was printed
-        print_calls = [call.args[0] for call in mock_print.call_args_list]
-        skip_found = any("Skipping 'gt restack'" in call for call in print_calls)
-        self.assertTrue(skip_found)
+        self.assertIn("Skipping 'gt restack'", stdout.getvalue())
 
 
 class TestSyncCommandLineIntegration(unittest.TestCase):
     """Test command line argument parsing for sync command"""
 
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
-    @patch('gt_commands.sync_command')
-    @patch('sys.argv', ['gt_commands.py', 'sync'])
-    def test_main_sync_default_args(self, mock_sync_command, mock_start_bg_check, mock_wait_and_notify):
-        """Test main function handles sync command with default arguments"""
-        from gt_commands import main
-        
-        main()
-        
-        mock_sync_command.assert_called_once_with(dry_run=False, skip_restack=False, current_stack=False, assume_yes=False)
-
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
-    @patch('gt_commands.sync_command')
-    @patch('sys.argv', ['gt_commands.py', 'sync', '--dry-run'])
-    def test_main_sync_dry_run_flag(self, mock_sync_command, mock_start_bg_check, mock_wait_and_notify):
-        """Test main function handles sync command with --dry-run flag"""
-        from gt_commands import main
-        
-        main()
-        
-        mock_sync_command.assert_called_once_with(dry_run=True, skip_restack=False, current_stack=False, assume_yes=False)
-
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
-    @patch('gt_commands.sync_command')
-    @patch('sys.argv', ['gt_commands.py', 'sync', '-d'])
-    def test_main_sync_dry_run_short_flag(self, mock_sync_command, mock_start_bg_check, mock_wait_and_notify):
-        """Test main function handles sync command with -d flag"""
-        from gt_commands import main
-        
-        main()
-        
-        mock_sync_command.assert_called_once_with(dry_run=True, skip_restack=False, current_stack=False, assume_yes=False)
-
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
-    @patch('gt_commands.sync_command')
-    @patch('sys.argv', ['gt_commands.py', 'sync', '--skip-restack'])
-    def test_main_sync_skip_restack_flag(self, mock_sync_command, mock_start_bg_check, mock_wait_and_notify):
-        """Test main function handles sync command with --skip-restack flag"""
-        from gt_commands import main
-        
-        main()
-        
-        mock_sync_command.assert_called_once_with(dry_run=False, skip_restack=True, current_stack=False, assume_yes=False)
-
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
-    @patch('gt_commands.sync_command')
-    @patch('sys.argv', ['gt_commands.py', 'sync', '-sr'])
-    def test_main_sync_skip_restack_short_flag(self, mock_sync_command, mock_start_bg_check, mock_wait_and_notify):
-        """Test main function handles sync command with -sr flag"""
-        from gt_commands import main
-        
-        main()
-        
-        mock_sync_command.assert_called_once_with(dry_run=False, skip_restack=True, current_stack=False, assume_yes=False)
-
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
-    @patch('gt_commands.sync_command')
-    @patch('sys.argv', ['gt_commands.py', 'sync', '--current-stack'])
-    def test_main_sync_current_stack_flag(self, mock_sync_command, mock_start_bg_check, mock_wait_and_notify):
-        """Test main function handles sync command with --current-stack flag"""
-        from gt_commands import main
-        
-        main()
-        
-        mock_sync_command.assert_called_once_with(dry_run=False, skip_restack=False, current_stack=True, assume_yes=False)
-
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
-    @patch('gt_commands.sync_command')
-    @patch('sys.argv', ['gt_commands.py', 'sync', '-cs'])
-    def test_main_sync_current_stack_short_flag(self, mock_sync_command, mock_start_bg_check, mock_wait_and_notify):
-        """Test main function handles sync command with -cs flag"""
-        from gt_commands import main
-        
-        main()
-        
-        mock_sync_command.assert_called_once_with(dry_run=False, skip_restack=False, current_stack=True, assume_yes=False)
-
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
-    @patch('gt_commands.sync_command')
-    @patch('sys.argv', ['gt_commands.py', 'sync', '--yes'])
-    def test_main_sync_yes_flag(self, mock_sync_command, mock_start_bg_check, mock_wait_and_notify):
-        """Test main function handles sync command with --yes flag"""
-        from gt_commands import main
-        
-        main()
-        
-        mock_sync_command.assert_called_once_with(dry_run=False, skip_restack=False, current_stack=False, assume_yes=True)
-
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
-    @patch('gt_commands.sync_command')
-    @patch('sys.argv', ['gt_commands.py', 'sync', '-y'])
-    def test_main_sync_yes_short_flag(self, mock_sync_command, mock_start_bg_check, mock_wait_and_notify):
-        """Test main function handles sync command with -y flag"""
-        from gt_commands import main
-        
-        main()
-        
-        mock_sync_command.assert_called_once_with(dry_run=False, skip_restack=False, current_stack=False, assume_yes=True)
-
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
-    @patch('gt_commands.sync_command')
-    @patch('sys.argv', ['gt_commands.py', 'sync', '--dry-run', '--skip-restack', '--current-stack'])
-    def test_main_sync_all_flags_combined(self, mock_sync_command, mock_start_bg_check, mock_wait_and_notify):
-        """Test main function handles sync command with all flags combined"""
-        from gt_commands import main
-        
-        main()
-        
-        mock_sync_command.assert_called_once_with(dry_run=True, skip_restack=True, current_stack=True, assume_yes=False)
-
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
-    @patch('gt_commands.sync_command')
-    @patch('sys.argv', ['gt_commands.py', 'sync', '-d', '-sr', '-cs'])
-    def test_main_sync_all_short_flags_combined(self, mock_sync_command, mock_start_bg_check, mock_wait_and_notify):
-        """Test main function handles sync command with all short flags combined"""
-        from gt_commands import main
-        
-        main()
-        
-        mock_sync_command.assert_called_once_with(dry_run=True, skip_restack=True, current_stack=True, assume_yes=False)
+    def setUp(self):
+        # Skip the version check and the sync itself; only the parsed arguments matter.
+        # Their return values are never used, so plain Mocks are enough.
+        patcher = patch.multiple(
+            'gt_commands',
+            new_callable=Mock,
+            wait_for_version_check_and_notify=DEFAULT,
+            start_background_version_check=DEFAULT,
+            sync_command=DEFAULT,
+        )
+        self.mock_sync_command = patcher.start()['sync_command']
+        self.addCleanup(patcher.stop)
+
+    def test_main_sync_flags(self):
+        """Test main function passes each sync flag (long, short and combined) to sync_command"""
+        cases = [
+            (['sync'], dict(dry_run=False, skip_restack=False, current_stack=False, assume_yes=False)),
+            (['sync', '--dry-run'], dict(dry_run=True, skip_restack=False, current_stack=False, assume_yes=False)),
+            (['sync', '-d'], dict(dry_run=True, skip_restack=False, current_stack=False, assume_yes=False)),
+            (['sync', '--skip-restack'], dict(dry_run=False, skip_restack=True, current_stack=False, assume_yes=False)),
+            (['sync', '-sr'], dict(dry_run=False, skip_restack=True, current_stack=False, assume_yes=False)),
+            (['sync', '--current-stack'], dict(dry_run=False, skip_restack=False, current_stack=True, assume_yes=False)),
+            (['sync', '-cs'], dict(dry_run=False, skip_restack=False, current_stack=True, assume_yes=False)),
+            (['sync', '--yes'], dict(dry_run=False, skip_restack=False, current_stack=False, assume_yes=True)),
+            (['sync', '-y'], dict(dry_run=False, skip_restack=False, current_stack=False, assume_yes=True)),
+            (['sync', '--dry-run', '--skip-restack', '--current-stack'], dict(dry_run=True, skip_restack=True, current_stack=True, assume_yes=False)),
+            (['sync', '-d', '-sr', '-cs'], dict(dry_run=True, skip_restack=True, current_stack=True, assume_yes=False)),
+        ]
+
+        for argv, expected in cases:
+            with self.subTest(argv=argv):
+                self.mock_sync_command.reset_mock()
+                with patch('sys.argv', ['gt_commands.py', *argv]):
+                    main()
+
+                self.mock_sync_command.assert_called_once_with(**expected)
 
 
 class TestSyncHelperFunctions(unittest.TestCase):
@@ -547,31 +382,228 @@ class TestSyncHelperFunctions(unittest.TestCase):
         self.assertEqual(result, expected)
 
     @patch('gt_commands.run_command')
-    def test_get_closed_pr_branches(self, mock_run_command):
-        """Test get_closed_pr_branches function"""
-        # Mock gh pr list output
-        mock_run_command.return_value = "feature_a\nfeature_b\nold_feature"
+    def test_get_current_branch_reads_head(self, mock_run_command):
+        """Test get_current_branch reads .git/HEAD without starting git"""
+        with tempfile.TemporaryDirectory() as repo_root:
+            os.makedirs(os.path.join(repo_root, ".git"))
+            nested = os.path.join(repo_root, "src", "pkg")
+            os.makedirs(nested)
+            head_path = os.path.join(repo_root, ".git", "HEAD")
+            cwd = os.getcwd()
+            try:
+                os.chdir(nested)
+                with patch.dict(os.environ):
+                    os.environ.pop("GIT_DIR", None)
+
+                    with open(head_path, "w") as f:
+                        f.write("ref: refs/heads/feature/a\n")
+                    self.assertEqual(get_current_branch(), "feature/a")
+
+                    # Detached HEAD has no current branch, like `git branch --show-current`
+                    with open(head_path, "w") as f:
+                        f.write("0123456789abcdef0123456789abcdef01234567\n")
+                    self.assertEqual(get_current_branch(), "")
+            finally:
+                os.chdir(cwd)
+
+        mock_run_command.assert_not_called()
 
-        result = get_closed_pr_branches()
-        
-        expected = {"feature_a", "feature_b", "old_feature"}
-        self.assertEqual(result, expected)
+    @patch('gt_commands.run_command')
+    def test_get_current_branch_falls_back_to_git(self, mock_run_command):
+        """Test get_current_branch asks git when HEAD can't be read directly"""
+        mock_run_command.return_value = "feature_a"
+        with patch('gt_commands.find_git_dir', return_value=None):
+            self.assertEqual(get_current_branch(), "feature_a")
+        mock_run_command.assert_called_once_with(["git", "branch", "--show-current"])
+
+    @patch('gt_commands._gh_cache_enabled', False)
+    @patch('gt_commands.is_ancestor', side_effect=lambda commit, descendant: (commit, descendant) == ("e1", "e2"))
+    @patch('gt_commands.run_command')
+    def test_get_closed_pr_branches_for_given_branches(self, mock_run_command, mock_is_ancestor):
+        """Test get_closed_pr_branches only counts merged PRs that contain the local branch"""
+        def pr(head, owner="testuser"):
+            return {"headRefOid": head, "headRepositoryOwner": owner and {"login": owner}}
+
+        # Mock the aliased GraphQL lookup (branches are queried in sorted order)
+        graphql_output = json.dumps({
+            "data": {"repository": {
+                "owner": {"login": "testuser"},
+                "b0": {"nodes": [pr("a1")]},  # feature_a: merged at the local tip
+                "b1": {"nodes": []},  # feature_b: never merged
+                "b2": {"nodes": [pr("c1", "someone"), pr("c1", None)]},  # feature_c: only forks
+                "b3": {"nodes": [pr("old")]},  # feature_d: an old PR from a reused name
+                "b4": {"nodes": [pr("e2")]},  # feature_e: merged head is ahead of the local tip
+            }}
+        })
+        local_tips = "\n".join([
+            "a1 refs/heads/feature_a",
+            "b1 refs/heads/feature_b",
+            "c1 refs/heads/feature_c",
+            "d1 refs/heads/feature_d",
+            "e1 refs/heads/feature_e",
+        ])
+        mock_run_command.side_effect = lambda command: (
+            graphql_output if command[0] == "gh" else local_tips
+        )
+
+        result = get_closed_pr_branches({"feature_b", "feature_a", "feature_c", "feature_d", "feature_e"})
+
+        self.assertEqual(result, {"feature_a", "feature_e"})
+        gh_calls = [c.args[0] for c in mock_run_command.call_args_list if c.args[0][0] == "gh"]
+        self.assertEqual(len(gh_calls), 1)
+        query = gh_calls[0][-1]
+        self.assertIn('headRefName: "feature_a", states: MERGED', query)
+        self.assertIn('headRefName: "feature_b", states: MERGED', query)
+        self.assertIn("headRefOid headRepositoryOwner { login }", query)
+
+    def test_local_branch_tips_and_ancestry(self):
+        """Test branch tips and ancestry are read from a real repository"""
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as repo:
+            def git(*args):
+                return subprocess.run(
+                    ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+                    cwd=repo, check=True, capture_output=True, text=True,
+                ).stdout.strip()
+
+            git("init", "-q", "-b", "main")
+            git("commit", "-q", "--allow-empty", "-m", "first")
+            first = git("rev-parse", "HEAD")
+            git("checkout", "-q", "-b", "feature/a")
+            git("commit", "-q", "--allow-empty", "-m", "second")
+            second = git("rev-parse", "HEAD")
+            try:
+                os.chdir(repo)
+                with patch.dict(os.environ):
+                    os.environ.pop("GIT_DIR", None)
+                    self.assertEqual(get_local_branch_tips(), {"main": first, "feature/a": second})
+                    self.assertTrue(is_ancestor(first, second))
+                    self.assertFalse(is_ancestor(second, first))
+                    # A commit this clone has never seen is not an ancestor
+                    self.assertFalse(is_ancestor("0" * 40, second))
+            finally:
+                os.chdir(cwd)
+
+    @patch('gt_commands.run_command')
+    def test_get_closed_pr_branches_for_no_branches(self, mock_run_command):
+        """Test get_closed_pr_branches skips GitHub entirely when there is nothing to check"""
+        self.assertEqual(get_closed_pr_branches(set()), set())
+        mock_run_command.assert_not_called()
+
+    @patch('gt_commands.run_command')
+    def test_run_cached_command_reuses_recent_output(self, mock_run_command):
+        """Test gh reads are served from the disk cache until it is cleared or disabled"""
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                patch('gt_commands.get_gh_cache_dir', return_value=cache_dir):
+            mock_run_command.return_value = "feature_a"
+            self.assertEqual(run_cached_command(["gh", "pr", "list"], 60), "feature_a")
+            self.assertEqual(run_cached_command(["gh", "pr", "list"], 60), "feature_a")
+            mock_run_command.assert_called_once()
+            # The entry is renamed into place, leaving no temp file behind
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            self.assertTrue(os.listdir(cache_dir)[0].endswith(".json"))
+
+            # An expired entry is refetched
+            mock_run_command.return_value = "feature_b"
+            self.assertEqual(run_cached_command(["gh", "pr", "list"], 0), "feature_b")
+
+            # Clearing (done after any gh write) forces a refetch
+            clear_gh_cache()
+            mock_run_command.return_value = "feature_c"
+            self.assertEqual(run_cached_command(["gh", "pr", "list"], 60), "feature_c")
+
+            # --no-cache always goes to GitHub
+            mock_run_command.return_value = "feature_d"
+            with patch('gt_commands._gh_cache_enabled', False):
+                self.assertEqual(run_cached_command(["gh", "pr", "list"], 60), "feature_d")
+            self.assertEqual(mock_run_command.call_count, 4)
+
+    @patch('gt_commands.run_command', return_value="feature_a")
+    def test_gh_cache_clears_and_prunes(self, mock_run_command):
+        """Test clearing only drops this repo's entries and misses sweep out expired ones"""
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                patch('gt_commands.get_gh_cache_dir', return_value=cache_dir):
+            other_repo_entry = os.path.join(cache_dir, "0123456789abcdef-query.json")
+            with open(other_repo_entry, "w") as f:
+                f.write(json.dumps({"ts": time.time(), "output": "other"}))
+            run_cached_command(["gh", "pr", "list"], 60)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+            # A gh write in this repo leaves other repos' cached reads alone
+            clear_gh_cache()
+            self.assertEqual(os.listdir(cache_dir), [os.path.basename(other_repo_entry)])
+
+            # Once nothing could serve it, the next miss removes it
+            os.utime(other_repo_entry, (0, 0))
+            run_cached_command(["gh", "pr", "list"], 60)
+            self.assertFalse(os.path.exists(other_repo_entry))
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            # An expired entry is removed on read, even if refetching it then fails
+            mock_run_command.side_effect = SystemExit(1)
+            with self.assertRaises(SystemExit):
+                run_cached_command(["gh", "pr", "list"], 0)
+            self.assertEqual(os.listdir(cache_dir), [])
 
     @patch('gt_commands.run_update_command')
-    @patch('builtins.print')
-    def test_delete_branch(self, mock_print, mock_run_update_command):
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_delete_branch(self, mock_stdout, mock_run_update_command):
         """Test delete_branch function"""
         delete_branch("test_branch", dry_run=False)
         
-        # Verify gt delete was called with the correct OG_GT_PATH
-        expected_call = mock_run_update_command.call_args[0][0]
-        self.assertTrue(expected_call.endswith("delete test_branch"))
+        # Verify gt delete was called with the bundled gt path
+        expected_call = mock_run_update_command.call_args.args[0]
+        self.assertEqual(expected_call[1:], ["delete", "test_branch", "--force"])
         
         # Verify success message was printed
-        mock_print.assert_called()
-        print_calls = [call.args[0] for call in mock_print.call_args_list]
-        delete_message_found = any("Deleted branch: test_branch" in call for call in print_calls)
-        self.assertTrue(delete_message_found)
+        self.assertRegex(mock_stdout.getvalue(), r"Deleted branch: .*test_branch")
+
+    @patch('gt_commands.gt_delete_accepts_multiple_branches', return_value=True)
+    @patch('gt_commands.run_update_command')
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_delete_branches_batched(self, mock_stdout, mock_run_update_command, mock_accepts_multiple):
+        """Test delete_branches deletes everything with one gt delete when supported"""
+        delete_branches(["feature_a", "feature_b"], dry_run=False)
+
+        mock_run_update_command.assert_called_once()
+        self.assertEqual(
+            mock_run_update_command.call_args.args[0][1:],
+            ["delete", "feature_a", "feature_b", "--force"],
+        )
+
+    @patch('gt_commands.run_command')
+    @patch('gt_commands.get_gt_delete_help_cache_path')
+    @patch('gt_commands.get_og_gt_path')
+    def test_gt_delete_probe_disk_cache(self, mock_gt_path, mock_help_cache_path, mock_run_command):
+        """Test the gt delete --help probe runs node once per gt install, not once per process"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            gt_path = os.path.join(temp_dir, "graphite.js")
+            with open(gt_path, "w") as f:
+                f.write("")
+            mock_gt_path.return_value = gt_path
+            mock_help_cache_path.return_value = os.path.join(temp_dir, "gt_delete_help.json")
+            mock_run_command.return_value = "gt delete [name..]\n\nDelete branches."
+
+            try:
+                gt_delete_accepts_multiple_branches.cache_clear()
+                self.assertTrue(gt_delete_accepts_multiple_branches())
+                # A new process (empty in-memory cache) reads the answer from disk
+                gt_delete_accepts_multiple_branches.cache_clear()
+                self.assertTrue(gt_delete_accepts_multiple_branches())
+                mock_run_command.assert_called_once()
+            finally:
+                gt_delete_accepts_multiple_branches.cache_clear()
+
+    @patch('gt_commands.gt_delete_accepts_multiple_branches', return_value=False)
+    @patch('gt_commands.delete_branch')
+    def test_delete_branches_falls_back_per_branch(self, mock_delete_branch, mock_accepts_multiple):
+        """Test delete_branches runs gt delete per branch when it only takes one name"""
+        delete_branches(["feature_a", "feature_b"], dry_run=True)
+
+        self.assertEqual(
+            [call.args for call in mock_delete_branch.call_args_list],
+            [("feature_a", True), ("feature_b", True)],
+        )
 
 
 if __name__ == "__main__":
@@ -6,7 +6,10 @@ import os
 import tempfile
 import json
 import threading
-from unittest.mock import patch, MagicMock, mock_open
+import time
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from unittest.mock import DEFAULT, patch, MagicMock, mock_open
 from datetime import datetime, timedelta
 
 # Add the bin directory to the path so we can import the module
@@ -22,20 +25,34 @@ from gt_commands import (
     check_for_updates_async,
     display_update_notification,
     start_background_version_check,
-    wait_for_version_check_and_notify
+    wait_for_version_check_and_notify,
+    get_graphite_version,
+    get_gt_help,
+    main,
 )
+import gt_commands
 
 
 class TestVersionChecking(unittest.TestCase):
     
+    @classmethod
+    def setUpClass(cls):
+        """Create one temporary directory for the whole class."""
+        cls._tmp = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove everything the tests wrote in one go."""
+        cls._tmp.cleanup()
+
     def setUp(self):
         """Set up test fixtures."""
-        self.test_cache_file = os.path.join(tempfile.gettempdir(), ".gt_wrapper_test_cache")
-        
-    def tearDown(self):
-        """Clean up after tests."""
-        if os.path.exists(self.test_cache_file):
-            os.remove(self.test_cache_file)
+        # Each test gets its own directory, so no test sees another's files
+        self.temp_dir = os.path.join(self._tmp.name, self._testMethodName)
+        os.mkdir(self.temp_dir)
+        self.test_cache_file = os.path.join(self.temp_dir, "version_cache.json")
+        # Don't let one test's in-memory copy of the cache leak into the next
+        gt_commands._version_cache_memo = None
     
     @patch('gt_commands.get_cache_file_path')
     def test_cache_operations(self, mock_cache_path):
@@ -53,7 +70,36 @@ class TestVersionChecking(unittest.TestCase):
         
         self.assertEqual(loaded_data["last_check"], "2024-01-01T12:00:00")
         self.assertEqual(loaded_data["latest_version"], "1.0.6")
+
+    @patch('gt_commands.get_cache_file_path')
+    def test_cache_is_read_once_per_process(self, mock_cache_path):
+        """Test repeated loads are served from memory instead of re-reading the file."""
+        mock_cache_path.return_value = self.test_cache_file
+        save_version_cache({"latest_version": "1.0.6"})
+        gt_commands._version_cache_memo = None
+
+        first = load_version_cache()
+        with patch('builtins.open', side_effect=AssertionError("cache file re-read")):
+            second = load_version_cache()
+
+        self.assertEqual(first, second)
+        # Callers get their own copy to modify
+        second["latest_version"] = "9.9.9"
+        self.assertEqual(load_version_cache()["latest_version"], "1.0.6")
         
+    @patch('gt_commands.get_wrapper_version')
+    @patch('gt_commands.get_cache_file_path')
+    def test_cache_discarded_after_wrapper_update(self, mock_cache_path, mock_get_wrapper):
+        """Test a cache written by another wrapper version is ignored."""
+        mock_cache_path.return_value = self.test_cache_file
+        mock_get_wrapper.return_value = "1.0.5"
+        save_version_cache({"latest_version": "1.0.6", "show_notification": True})
+
+        # The user updated to 1.0.6 in the meantime
+        gt_commands._version_cache_memo = None
+        mock_get_wrapper.return_value = "1.0.6"
+        self.assertEqual(load_version_cache(), {})
+
     @patch('gt_commands.get_cache_file_path')
     def test_load_cache_nonexistent_file(self, mock_cache_path):
         """Test loading cache when file doesn't exist."""
@@ -70,6 +116,52 @@ class TestVersionChecking(unittest.TestCase):
         
         # Should not raise exception
         save_version_cache({"test": "data"})
+
+    @patch('gt_commands.run_command')
+    @patch('gt_commands.get_graphite_version_cache_path')
+    @patch('gt_commands.get_og_gt_path')
+    def test_graphite_version_disk_cache(self, mock_gt_path, mock_version_cache_path, mock_run_command):
+        """Test the bundled Graphite version is reused until graphite.js changes."""
+        gt_path = os.path.join(self.temp_dir, "graphite.js")
+        with open(gt_path, "w") as f:
+            f.write("")
+        mock_gt_path.return_value = gt_path
+        mock_version_cache_path.return_value = os.path.join(self.temp_dir, "graphite_version.json")
+        mock_run_command.return_value = "1.4.3"
+
+        get_graphite_version.cache_clear()
+        self.assertEqual(get_graphite_version(), "1.4.3")
+        get_graphite_version.cache_clear()
+        self.assertEqual(get_graphite_version(), "1.4.3")
+        # Second lookup came from the disk cache
+        mock_run_command.assert_called_once()
+
+        # A reinstalled graphite.js (new mtime) invalidates the cached version
+        os.utime(gt_path, (0, 0))
+        mock_run_command.return_value = "1.5.0"
+        get_graphite_version.cache_clear()
+        self.assertEqual(get_graphite_version(), "1.5.0")
+        get_graphite_version.cache_clear()
+
+    @patch('gt_commands.run_command')
+    @patch('gt_commands.get_gt_help_cache_path')
+    @patch('gt_commands.get_og_gt_path')
+    def test_gt_help_disk_cache(self, mock_gt_path, mock_help_cache_path, mock_run_command):
+        """Test the trimmed gt --help output is reused until graphite.js changes."""
+        gt_path = os.path.join(self.temp_dir, "graphite.js")
+        with open(gt_path, "w") as f:
+            f.write("")
+        mock_gt_path.return_value = gt_path
+        mock_help_cache_path.return_value = os.path.join(self.temp_dir, "gt_help.json")
+        mock_run_command.return_value = "USAGE\nAUTHENTICATING\nsecret\nTERMS\nfooter"
+
+        self.assertEqual(get_gt_help(), "USAGE\nTERMS\nfooter")
+        self.assertEqual(get_gt_help(), "USAGE\nTERMS\nfooter")
+        mock_run_command.assert_called_once()
+
+        os.utime(gt_path, (0, 0))
+        get_gt_help()
+        self.assertEqual(mock_run_command.call_count, 2)
         
     def test_version_comparison(self):
         """Test version comparison logic."""
@@ -96,6 +188,11 @@ class TestVersionChecking(unittest.TestCase):
         self.assertFalse(compare_versions("invalid", "1.0.0"))
         self.assertFalse(compare_versions("1.0.0", "invalid"))
         self.assertFalse(compare_versions("1.0", "1.0.0"))
+
+    def test_version_comparison_prerelease_suffix(self):
+        """Test version comparison ignores pre-release/build suffixes."""
+        self.assertTrue(compare_versions("1.0.5-beta.1", "1.0.6"))
+        self.assertFalse(compare_versions("1.0.6", "1.0.6-rc.1"))
         
     @patch('gt_commands.load_version_cache')
     def test_should_check_version_no_cache(self, mock_load_cache):
@@ -116,13 +213,37 @@ class TestVersionChecking(unittest.TestCase):
     @patch('gt_commands.load_version_cache')
     def test_should_check_version_old_check(self, mock_load_cache):
         """Test should_check_version with old check."""
-        old_date = (datetime.now() - timedelta(days=2)).isoformat()
+        old_date = (datetime.now() - timedelta(days=8)).isoformat()
         mock_load_cache.return_value = {
             "last_check": old_date
         }
         
         self.assertTrue(should_check_version())
+
+    @patch('gt_commands.load_version_cache')
+    def test_should_check_version_epoch_last_check(self, mock_load_cache):
+        """Test should_check_version with last_check stored as epoch seconds."""
+        mock_load_cache.return_value = {"last_check": time.time()}
+        self.assertFalse(should_check_version())
+
+        mock_load_cache.return_value = {"last_check": time.time() - 8 * 24 * 60 * 60}
+        self.assertTrue(should_check_version())
         
+    @patch('gt_commands.load_version_cache')
+    def test_should_check_version_uses_next_check(self, mock_load_cache):
+        """Test should_check_version honors the stored next_check_ts over last_check."""
+        mock_load_cache.return_value = {
+            "last_check": (datetime.now() - timedelta(days=30)).isoformat(),
+            "next_check_ts": time.time() + 24 * 60 * 60,
+        }
+        self.assertFalse(should_check_version())
+
+        mock_load_cache.return_value = {
+            "last_check": datetime.now().isoformat(),
+            "next_check_ts": time.time() - 60,
+        }
+        self.assertTrue(should_check_version())
+
     @patch('gt_commands.load_version_cache')
     def test_should_check_version_invalid_date(self, mock_load_cache):
         """Test should_check_version with invalid date format."""
@@ -142,6 +263,32 @@ class TestVersionChecking(unittest.TestCase):
         result = get_latest_wrapper_version()
         self.assertEqual(result, "1.0.6")
         
+    @patch('urllib.request.urlopen')
+    def test_get_latest_wrapper_version_stores_validators(self, mock_urlopen):
+        """Test that the response's ETag/Last-Modified are kept for the next check."""
+        mock_response = MagicMock()
+        mock_response.read.return_value = json.dumps({"version": "1.0.6"}).encode()
+        mock_response.headers = {"ETag": '"abc"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+        mock_urlopen.return_value.__enter__.return_value = mock_response
+
+        cache = {}
+        self.assertEqual(get_latest_wrapper_version(cache), "1.0.6")
+        self.assertEqual(cache["etag"], '"abc"')
+        self.assertEqual(cache["last_modified"], "Wed, 01 Jan 2025 00:00:00 GMT")
+
+    @patch('urllib.request.urlopen')
+    def test_get_latest_wrapper_version_not_modified(self, mock_urlopen):
+        """Test that a 304 reuses the cached latest version."""
+        mock_urlopen.side_effect = urllib.error.HTTPError(
+            "https://registry.npmjs.org", 304, "Not Modified", {}, None
+        )
+
+        cache = {"latest_version": "1.0.6", "etag": '"abc"'}
+        self.assertEqual(get_latest_wrapper_version(cache), "1.0.6")
+
+        request = mock_urlopen.call_args.args[0]
+        self.assertEqual(request.get_header("If-none-match"), '"abc"')
+
     @patch('urllib.request.urlopen')
     def test_get_latest_wrapper_version_network_error(self, mock_urlopen):
         """Test network error handling in API call."""
@@ -195,6 +342,30 @@ class TestVersionChecking(unittest.TestCase):
         mock_get_latest.assert_not_called()
         mock_save_cache.assert_not_called()
         
+    @patch('gt_commands.save_version_cache')
+    @patch('gt_commands.load_version_cache')
+    @patch('gt_commands.get_latest_wrapper_version')
+    @patch('gt_commands.get_wrapper_version')
+    @patch('gt_commands.should_check_version')
+    def test_check_for_updates_async_failure_backs_off(self, mock_should_check,
+                                                       mock_get_wrapper, mock_get_latest,
+                                                       mock_load_cache, mock_save_cache):
+        """Test a failed check keeps the cached data and retries with exponential backoff."""
+        mock_should_check.return_value = True
+        mock_get_wrapper.return_value = "1.0.5"
+        mock_get_latest.return_value = None
+        mock_load_cache.return_value = {"latest_version": "1.0.6", "failures": 2}
+
+        check_for_updates_async()
+
+        call_args = mock_save_cache.call_args.args[0]
+        self.assertEqual(call_args["latest_version"], "1.0.6")
+        self.assertEqual(call_args["failures"], 3)
+        self.assertFalse(call_args["show_notification"])
+        # Third consecutive failure: 1h * 2^2 = 4 hours
+        hours_until_retry = (call_args["next_check_ts"] - time.time()) / (60 * 60)
+        self.assertAlmostEqual(hours_until_retry, 4, places=1)
+
     @patch('gt_commands.save_version_cache')
     @patch('gt_commands.get_latest_wrapper_version')
     @patch('gt_commands.get_wrapper_version')
@@ -210,11 +381,15 @@ class TestVersionChecking(unittest.TestCase):
         check_for_updates_async()
         
         mock_save_cache.assert_called_once()
-        call_args = mock_save_cache.call_args[0][0]
+        call_args = mock_save_cache.call_args.args[0]
         
         # Cache remote data and notification flag
         self.assertEqual(call_args["latest_version"], "1.0.6")
-        self.assertIn("last_check", call_args)
+        self.assertAlmostEqual(call_args["last_check"], time.time(), delta=60)
+        # The next check is scheduled about a week out, with jitter
+        days_until_next_check = (call_args["next_check_ts"] - time.time()) / (24 * 60 * 60)
+        self.assertGreater(days_until_next_check, 6)
+        self.assertLess(days_until_next_check, 8)
         self.assertTrue(call_args["show_notification"])  # Should show notification when update found
         # These fields are no longer cached
         self.assertNotIn("current_version", call_args)
@@ -243,7 +418,7 @@ class TestVersionChecking(unittest.TestCase):
         
         # Verify that show_notification flag was cleared
         mock_save_cache.assert_called_once()
-        saved_cache = mock_save_cache.call_args[0][0]
+        saved_cache = mock_save_cache.call_args.args[0]
         self.assertFalse(saved_cache["show_notification"])
         
     @patch('gt_commands.get_wrapper_version')
@@ -293,10 +468,13 @@ class TestVersionChecking(unittest.TestCase):
         self.assertEqual(str(cm.exception), "Failed to get wrapper version")
         mock_print.assert_not_called()
         
+    @patch('gt_commands._version_check_thread', None)
+    @patch('gt_commands.sys.stdout')
     @patch('gt_commands.should_check_version')
     @patch('threading.Thread')
-    def test_start_background_version_check(self, mock_thread, mock_should_check):
+    def test_start_background_version_check(self, mock_thread, mock_should_check, mock_stdout):
         """Test starting background version check."""
+        mock_stdout.isatty.return_value = True
         mock_should_check.return_value = True
         mock_thread_instance = MagicMock()
         mock_thread.return_value = mock_thread_instance
@@ -305,7 +483,7 @@ class TestVersionChecking(unittest.TestCase):
         
         mock_thread.assert_called_once()
         mock_thread_instance.start.assert_called_once()
-        
+
     @patch('gt_commands.should_check_version')
     @patch('threading.Thread')
     def test_start_background_version_check_not_needed(self, mock_thread, mock_should_check):
@@ -315,126 +493,138 @@ class TestVersionChecking(unittest.TestCase):
         start_background_version_check()
         
         mock_thread.assert_not_called()
+
+    @patch('gt_commands.display_update_notification')
+    def test_wait_for_version_check_uses_remaining_budget(self, mock_display):
+        """Test the wait is bounded by the time left since the check started."""
+        mock_thread = MagicMock()
+        with patch('gt_commands._version_check_thread', mock_thread), \
+                patch('gt_commands._version_check_deadline', 0.0):
+            # The command outlasted the budget, so don't wait at all
+            wait_for_version_check_and_notify()
+
+        mock_thread.join.assert_called_once_with(timeout=0.0)
+        mock_display.assert_called_once()
+
+    @patch('gt_commands.sys.stdout')
+    @patch('gt_commands.should_check_version')
+    @patch('threading.Thread')
+    def test_start_background_version_check_non_interactive(self, mock_thread, mock_should_check, mock_stdout):
+        """Test skipping the background check when stdout isn't a terminal."""
+        mock_stdout.isatty.return_value = False
+        mock_should_check.return_value = True
+
+        start_background_version_check()
+
+        mock_thread.assert_not_called()
+    
+    @patch('gt_commands.get_cache_file_path')
+    @patch('gt_commands.get_wrapper_version')
+    @patch('gt_commands.get_latest_wrapper_version')
+    @patch('gt_commands.should_check_version')
+    def test_threading_safety(self, mock_should_check, mock_get_latest, mock_get_wrapper, mock_cache_path):
+        """Test that multiple concurrent version checks don't interfere with shared cache file."""
+        mock_cache_path.return_value = self.test_cache_file
+        mock_should_check.return_value = True
+        mock_get_wrapper.return_value = "1.0.5"  # Mock current version (older)
+        mock_get_latest.return_value = "1.0.6"   # Mock latest version (newer)
+
+        # Release every check at once so the cache writes really overlap
+        num_threads = 10
+        barrier = threading.Barrier(num_threads)
+
+        def run_check():
+            barrier.wait(timeout=5)
+            check_for_updates_async()
+
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            futures = [executor.submit(run_check) for _ in range(num_threads)]
+            # Re-raises anything a check raised
+            for future in as_completed(futures, timeout=5):
+                future.result()
+
+        # Verify cache file was created and contains expected data
+        self.assertTrue(os.path.exists(self.test_cache_file))
+        with open(self.test_cache_file, 'r') as f:
+            cache_data = json.load(f)
+            self.assertEqual(cache_data["latest_version"], "1.0.6")
+            self.assertIn("last_check", cache_data)
+            self.assertTrue(cache_data["show_notification"])
+            # These fields are no longer cached
+            self.assertNotIn("current_version", cache_data)
+
     
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
+
+class TestMainIntegration(unittest.TestCase):
+    """Test main() runs the version check around each kind of command"""
+
+    def setUp(self):
+        patcher = patch.multiple(
+            'gt_commands',
+            wait_for_version_check_and_notify=DEFAULT,
+            start_background_version_check=DEFAULT,
+        )
+        mocks = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_wait_and_notify = mocks['wait_for_version_check_and_notify']
+        self.mock_start_bg_check = mocks['start_background_version_check']
+
     @patch('gt_commands.show_version')
     @patch('sys.argv', ['gt_commands.py', '--version'])
-    def test_main_version_command_integration(self, mock_show_version, 
-                                            mock_start_bg_check, mock_wait_and_notify):
+    def test_main_version_command_integration(self, mock_show_version):
         """Test main function handles version command with proper version checking."""
-        from gt_commands import main
-        
         with self.assertRaises(SystemExit) as cm:
             main()
         
         self.assertEqual(cm.exception.code, 0)
-        mock_start_bg_check.assert_called_once()
+        self.mock_start_bg_check.assert_called_once()
         mock_show_version.assert_called_once()
-        mock_wait_and_notify.assert_called_once()
+        self.mock_wait_and_notify.assert_called_once()
     
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
     @patch('gt_commands.sync_command')
     @patch('sys.argv', ['gt_commands.py', 'sync'])
-    def test_main_sync_command_integration(self, mock_sync_command,
-                                         mock_start_bg_check, mock_wait_and_notify):
+    def test_main_sync_command_integration(self, mock_sync_command):
         """Test main function handles sync command with proper version checking."""
-        from gt_commands import main
-        
         main()
         
-        mock_start_bg_check.assert_called_once()
-        mock_sync_command.assert_called_once_with(dry_run=False, skip_restack=False, current_stack=False)
-        mock_wait_and_notify.assert_called_once()
+        self.mock_start_bg_check.assert_called_once()
+        mock_sync_command.assert_called_once_with(dry_run=False, skip_restack=False, current_stack=False, assume_yes=False)
+        self.mock_wait_and_notify.assert_called_once()
     
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')  
     @patch('gt_commands.submit_command')
     @patch('sys.argv', ['gt_commands.py', 'submit', '--single'])
-    def test_main_submit_command_integration(self, mock_submit_command,
-                                           mock_start_bg_check, mock_wait_and_notify):
+    def test_main_submit_command_integration(self, mock_submit_command):
         """Test main function handles submit command with proper version checking."""
-        from gt_commands import main
-        
         main()
         
-        mock_start_bg_check.assert_called_once()
+        self.mock_start_bg_check.assert_called_once()
         mock_submit_command.assert_called_once_with(mode='single', dry_run=False)
-        mock_wait_and_notify.assert_called_once()
+        self.mock_wait_and_notify.assert_called_once()
     
-    @patch('gt_commands.wait_for_version_check_and_notify')
-    @patch('gt_commands.start_background_version_check')
     @patch('gt_commands.run_uncaptured_command')
     @patch('gt_commands.is_valid_gt_command')
     @patch('sys.argv', ['gt_commands.py', 'log'])
-    def test_main_passthrough_command_integration(self, mock_is_valid, mock_run_cmd,
-                                                mock_start_bg_check, mock_wait_and_notify):
+    def test_main_passthrough_command_integration(self, mock_is_valid, mock_run_cmd):
         """Test main function handles passthrough commands with proper version checking."""
-        from gt_commands import main
         mock_is_valid.return_value = True
         
         main()
         
-        mock_start_bg_check.assert_called_once()
+        self.mock_start_bg_check.assert_called_once()
         mock_run_cmd.assert_called_once()
-        mock_wait_and_notify.assert_called_once()
-    
-    @patch('gt_commands.get_cache_file_path')
-    @patch('gt_commands.get_wrapper_version')
-    @patch('gt_commands.get_latest_wrapper_version')
-    @patch('gt_commands.should_check_version')
-    def test_threading_safety(self, mock_should_check, mock_get_latest, mock_get_wrapper, mock_cache_path):
-        """Test that multiple concurrent version checks don't interfere with shared cache file."""
-        import threading
-        import tempfile
-        
-        # Use a temp directory for this integration-style test
-        with tempfile.TemporaryDirectory() as temp_dir:
-            test_cache_file = os.path.join(temp_dir, "threading_test_cache.json")
-            mock_cache_path.return_value = test_cache_file
-            
-            results = []
-            errors = []
-            
-            mock_should_check.return_value = True
-            mock_get_wrapper.return_value = "1.0.5"  # Mock current version (older)
-            mock_get_latest.return_value = "1.0.6"   # Mock latest version (newer)
-            
-            def run_check():
-                try:
-                    check_for_updates_async()
-                    results.append("success")
-                except Exception as e:
-                    errors.append(str(e))
-            
-            # Start multiple threads
-            threads = []
-            num_threads = 10
-            for i in range(num_threads):
-                t = threading.Thread(target=run_check)
-                threads.append(t)
-                t.start()
-            
-            # Wait for all to complete
-            for t in threads:
-                t.join(timeout=1.0)
-            
-            # Should have no errors and all successes
-            self.assertEqual(len(errors), 0, f"Errors occurred: {errors}")
-            self.assertEqual(len(results), num_threads)
-            
-            # Verify cache file was created and contains expected data
-            self.assertTrue(os.path.exists(test_cache_file))
-            with open(test_cache_file, 'r') as f:
-                cache_data = json.load(f)
-                self.assertEqual(cache_data["latest_version"], "1.0.6")
-                self.assertIn("last_check", cache_data)
-                self.assertTrue(cache_data["show_notification"])
-                # These fields are no longer cached
-                self.assertNotIn("current_version", cache_data)
+        self.mock_wait_and_notify.assert_called_once()
+
+    @patch('gt_commands.run_uncaptured_command')
+    @patch('gt_commands.is_git_alias', return_value=True)
+    @patch('gt_commands.is_valid_gt_command', return_value=False)
+    @patch('sys.argv', ['gt_commands.py', 'st', '-s'])
+    def test_main_git_alias_passthrough(self, mock_is_valid, mock_is_alias, mock_run_cmd):
+        """Test main function hands git aliases to git."""
+        main()
+
+        mock_run_cmd.assert_called_once_with(["git", "st", "-s"])
+        self.mock_wait_and_notify.assert_called_once()
 
-    
 
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file